@@ -1,26 +1,209 @@
 import discord
+from discord import app_commands
 import os
 import json
 import asyncio
 import threading
 import time
 import subprocess
-from datetime import datetime, time as dt_time, timedelta
+import copy
+import queue
+import random
+import logging
+import logging.handlers
+import csv
+import io
+import tempfile
+import hashlib
+import base64
+import secrets
+import multiprocessing
+from types import MappingProxyType
+import argparse
+import atexit
+import signal
+import sys
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import NamedTuple, Optional
 from dateutil.relativedelta import relativedelta
 from zoneinfo import ZoneInfo
 
 TOKEN = os.getenv("DISCORD_TOKEN")
 CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID", 0))
-ADMIN_USER_ID = 1367955172373823629
+ADMIN_USER_ID = int(os.getenv("DISCORD_ADMIN_ID", 1367955172373823629))
 DATA_FILE = "gov_state.json"
 EST = ZoneInfo("America/New_York")
+PROCESS_START = time.monotonic()
 
-print("=" * 60)
-print("GOVERNMENT DATE BOT")
-print("=" * 60)
-print(f"Token: {'PRESENT' if TOKEN else 'MISSING'}")
-print(f"Channel ID: {CHANNEL_ID}")
-print(f"Admin ID: {ADMIN_USER_ID}")
+# ==================== CLOCK ====================
+
+class SystemClock:
+    """Real time in EST"""
+    def now(self):
+        return datetime.now(EST)
+
+class SimulatedClock:
+    """Manually advanced time for simulations (see simulate.py)"""
+    def __init__(self, start):
+        # Kept in UTC so stepping across DST changes behaves like real time
+        self.current = start.astimezone(timezone.utc)
+
+    def now(self):
+        return self.current.astimezone(EST)
+
+    def advance(self, delta):
+        self.current += delta
+
+clock = SystemClock()
+
+def now_est():
+    """Current EST time from the active clock"""
+    return clock.now()
+
+def set_clock(new_clock):
+    """Swap the clock every time lookup goes through"""
+    global clock
+    clock = new_clock
+
+# ==================== LOGGING ====================
+
+LOG_FORMAT = os.getenv("LOG_FORMAT")  # "json" or "text"; defaults to the host profile
+LOG_FILE = os.getenv("LOG_FILE")  # Empty string disables the file sink
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# Fraction of records kept per logger category (everything else is kept)
+LOG_SAMPLE_RATES = {
+    "govbot.chat": float(os.getenv("LOG_SAMPLE_CHAT", 0.01)),
+}
+
+log = logging.getLogger("govbot")
+state_log = logging.getLogger("govbot.state")
+advance_log = logging.getLogger("govbot.advance")
+command_log = logging.getLogger("govbot.command")
+chat_log = logging.getLogger("govbot.chat")
+
+class JsonFormatter(logging.Formatter):
+    """Render each record as a single JSON line"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, EST).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Plain console lines, with structured fields appended as key=value"""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class SamplingFilter(logging.Filter):
+    """Drop a fixed fraction of records per logger category"""
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        for prefix, rate in self.rates.items():
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the event loop; drops records when full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback now so the writer thread never
+        # touches live objects, but keep structured fields intact
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+log_listener = None
+
+def setup_logging(log_format="json", log_file="bot.log"):
+    """Route all bot logging through a queue drained by a background writer"""
+    global log_listener
+    if log_format == "text":
+        formatter = TextFormatter()
+    else:
+        formatter = JsonFormatter()
+
+    sinks = []
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    sinks.append(console)
+    file_error = None
+    if log_file:
+        try:
+            file_sink = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        except OSError as e:
+            # Keep running with console logging only
+            file_error = e
+        else:
+            file_sink.setFormatter(formatter)
+            sinks.append(file_sink)
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+    # discord.py logs through the same pipeline at WARNING and above
+    discord_log = logging.getLogger("discord")
+    discord_log.addHandler(handler)
+    discord_log.setLevel(logging.WARNING)
+
+    log_listener = logging.handlers.QueueListener(handler.queue, *sinks, respect_handler_level=True)
+    log_listener.start()
+    if file_error:
+        log.warning("Log file unavailable, logging to console only", extra={"fields": {
+            "file": log_file,
+            "error": str(file_error),
+        }})
+
+def apply_log_level():
+    """Map the debug_mode setting onto the bot log level"""
+    debug = settings_snapshot["values"]["debug_mode"] or profile.get("debug", False)
+    log.setLevel(logging.DEBUG if debug else logging.INFO)
+
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    global log_listener
+    if log_listener:
+        log_listener.stop()
+        log_listener = None
 
 # Global state and save system
 state = {}
@@ -29,6 +212,32 @@ save_interval = 60  # Auto-save every 60 seconds
 last_save_time = time.time()
 auto_save_thread = None
 stop_event = threading.Event()
+coordinator_link = None  # Set in shard worker processes, see CoordinatorLink
+
+# ==================== HOST PROFILES ====================
+
+# Every host runs the same state engine and scheduler; profiles only differ
+# in how long the process lives and how it logs.
+#   deadline: seconds after process start when the host kills us (None = never)
+PROFILES = {
+    # Fly.io machine, long-lived; Fly collects the console output and /app
+    # isn't writable by the container user
+    "fly": {"deadline": None, "log_format": "json", "log_file": "", "debug": False},
+    # GitHub Actions job, killed by `timeout 1320`
+    "actions": {"deadline": 1320, "log_format": "json", "log_file": "bot.log", "debug": False},
+    # PythonAnywhere free tier scheduled task, restarted every 3 hours
+    "pythonanywhere": {"deadline": 10800, "log_format": "json", "log_file": "bot.log", "debug": False},
+    # Local development
+    "local": {"deadline": None, "log_format": "text", "log_file": "", "debug": True},
+}
+DEFAULT_PROFILE = "fly"
+
+# Stop taking commands this many seconds before the deadline, then drain
+DRAIN_MARGIN = int(os.getenv("DRAIN_MARGIN", 60))
+# Longest we wait for in-flight commands and queued messages while draining
+DRAIN_TIMEOUT = int(os.getenv("DRAIN_TIMEOUT", 20))
+
+profile = {}  # Active host profile, set by start_runtime()
 
 def load_state():
     global state
@@ -38,12 +247,32 @@ def load_state():
             
         # Migration from old formats
         if "last_run" in state and "last_advance_date" not in state:
-            print("Migrating from old state format...")
+            state_log.info("Migrating from old state format")
             state["last_advance_date"] = state["last_run"]
             del state["last_run"]
+        
+        # Older runtimes wrote naive timestamps; pin them to EST
+        for key in ("current_date", "last_check_timestamp"):
+            if key in state:
+                dt = datetime.fromisoformat(state[key])
+                if dt.tzinfo is None:
+                    state[key] = dt.replace(tzinfo=EST).isoformat()
+        
+        # Manual advances used to be logged as "scheduled"; a scheduled
+        # advance always has at least one missed day
+        relabeled = False
+        for entry in state.get("advancement_history", []):
+            if entry.get("type") == "scheduled" and entry.get("days_missed") == 0:
+                entry["type"] = "manual"
+                relabeled = True
+        
+        # Aggregates were added later; seed them from the stored history
+        if "stats" not in state or relabeled:
+            state_log.info("Building stats from history")
+            state["stats"] = rebuild_stats(state)
             
         # Ensure all required keys exist
-        now = datetime.now(EST)
+        now = now_est()
         defaults = {
             "current_date": now.isoformat(),
             "last_advance_date": now.date().isoformat(),
@@ -57,20 +286,23 @@ def load_state():
                 "months_per_day": 4,
                 "auto_save": True,
                 "debug_mode": False
-            }
+            },
+            "permissions": {},
+            "clock": {},
+            "stats": empty_stats()
         }
         
         for key, default_value in defaults.items():
             if key not in state:
                 state[key] = default_value
-                print(f"Added missing key: {key}")
+                state_log.info("Added missing key", extra={"fields": {"key": key}})
         
         save_state()
         return state
         
     except FileNotFoundError:
-        print("Creating new state file...")
-        now = datetime.now(EST)
+        state_log.info("Creating new state file")
+        now = now_est()
         state = {
             "current_date": now.isoformat(),
             "last_advance_date": now.date().isoformat(),
@@ -84,13 +316,16 @@ def load_state():
                 "months_per_day": 4,
                 "auto_save": True,
                 "debug_mode": False
-            }
+            },
+            "permissions": {},
+            "clock": {},
+            "stats": empty_stats()
         }
         save_state()
         return state
     except Exception as e:
-        print(f"Error loading state: {e}")
-        now = datetime.now(EST)
+        state_log.exception("Error loading state")
+        now = now_est()
         state = {
             "current_date": now.isoformat(),
             "last_advance_date": now.date().isoformat(),
@@ -104,82 +339,396 @@ def load_state():
                 "months_per_day": 4,
                 "auto_save": True,
                 "debug_mode": False
-            }
+            },
+            "permissions": {},
+            "clock": {},
+            "stats": empty_stats()
         }
         return state
 
-def save_state():
+def save_state(durable=False):
+    """Write the state atomically; durable also fsyncs, for the final save"""
     global last_save_time
+    if coordinator_link is not None:
+        # Shard workers hold a replica; the coordinator owns the file
+        coordinator_link.push_changes()
+        return True
     with save_lock:
         try:
-            with open(DATA_FILE, "w") as f:
+            # Write to a temp file and swap it in, so a kill mid-write
+            # never leaves a truncated state file behind
+            tmp_file = DATA_FILE + ".tmp"
+            with open(tmp_file, "w") as f:
                 json.dump(state, f, indent=2)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, DATA_FILE)
             last_save_time = time.time()
-            print(f"State saved at {datetime.now().strftime('%H:%M:%S')}")
+            state_log.debug("State saved")
             return True
         except Exception as e:
-            print(f"Error saving state: {e}")
+            state_log.exception("Error saving state")
             return False
 
 def auto_save_worker():
     """Background thread for auto-saving"""
-    while not stop_event.is_set():
-        time.sleep(save_interval)
-        if not stop_event.is_set() and state.get("settings", {}).get("auto_save", True):
+    while not stop_event.wait(save_interval):
+        if settings()["auto_save"]:
             save_state()
 
-# Initialize state
-load_state()
-current_date = datetime.fromisoformat(state.get("current_date", datetime.now(EST).isoformat()))
-last_advance_date = datetime.fromisoformat(state.get("last_advance_date", datetime.now(EST).date().isoformat())).date()
-today = datetime.now(EST).date()
+# ==================== SETTINGS ====================
+
+# Optional JSON file of settings; edits to it are picked up without a restart
+CONFIG_FILE = os.getenv("CONFIG_FILE", "")
+# The file's mtime is checked lazily when settings are read, at most this often
+CONFIG_CHECK_INTERVAL = 5
+
+SETTINGS_SCHEMA = {
+    "months_per_day": {"type": int, "min": 1, "max": 120, "default": 4},
+    "max_advance_per_run": {"type": int, "min": 1, "max": 1200, "default": 12},
+    "auto_save": {"type": bool, "default": True},
+    "debug_mode": {"type": bool, "default": False},
+    # Bounds on user text kept in history and parsed as commands
+    "history_content_limit": {"type": int, "min": 16, "max": 2000, "default": 200},
+    "max_command_length": {"type": int, "min": 16, "max": 4000, "default": 500},
+}
+
+# Components read this immutable snapshot; every change publishes a new
+# one with a higher version instead of mutating it in place
+settings_lock = threading.Lock()
+settings_snapshot = {
+    "version": 0,
+    "values": MappingProxyType({key: spec["default"] for key, spec in SETTINGS_SCHEMA.items()}),
+}
+config_file_state = {"mtime": None, "checked": 0.0}
+
+def validate_setting(key, value):
+    """Coerce and check one setting value; raises ValueError"""
+    spec = SETTINGS_SCHEMA.get(key)
+    if spec is None:
+        raise ValueError(f"Unknown setting '{key}'. Known: {', '.join(SETTINGS_SCHEMA)}")
+    
+    if spec["type"] is bool:
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ["on", "enable", "yes", "true", "1"]:
+            return True
+        if str(value).lower() in ["off", "disable", "no", "false", "0"]:
+            return False
+        raise ValueError(f"{key} must be on or off")
+    
+    if isinstance(value, bool):
+        raise ValueError(f"{key} must be a number")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a whole number")
+    if not spec["min"] <= value <= spec["max"]:
+        raise ValueError(f"{key} must be between {spec['min']} and {spec['max']}")
+    return value
+
+def build_settings(*sources):
+    """Merge setting sources over the defaults, skipping invalid values"""
+    values = {key: spec["default"] for key, spec in SETTINGS_SCHEMA.items()}
+    for source in sources:
+        for key, value in (source or {}).items():
+            try:
+                values[key] = validate_setting(key, value)
+            except ValueError as e:
+                log.warning("Ignoring invalid setting", extra={"fields": {"key": key, "error": str(e)}})
+    return values
+
+def publish_settings(values, source):
+    """Swap in a new snapshot and mirror it into the state"""
+    with settings_lock:
+        old = dict(settings_snapshot["values"])
+        if old == values and settings_snapshot["version"]:
+            return False
+        settings_snapshot["values"] = MappingProxyType(values)
+        settings_snapshot["version"] += 1
+        version = settings_snapshot["version"]
+    
+    state["settings"] = dict(values)
+    apply_log_level()
+    changed = {key: value for key, value in values.items() if old.get(key) != value}
+    log.info("Settings updated", extra={"fields": {"version": version, "source": source, "changed": changed}})
+    return True
+
+def read_config_file():
+    """Read the settings file; {} if absent, None if unreadable"""
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        log.exception("Error reading config file")
+        return None
+    if not isinstance(data, dict):
+        log.warning("Config file must hold a JSON object", extra={"fields": {"file": CONFIG_FILE}})
+        return None
+    return data
+
+def config_file_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def load_settings():
+    """Build the first snapshot from the state and the config file"""
+    file_values = {}
+    if CONFIG_FILE:
+        config_file_state["mtime"] = config_file_mtime()
+        config_file_state["checked"] = time.monotonic()
+        file_values = read_config_file() or {}
+    publish_settings(build_settings(state.get("settings"), file_values), "startup")
+
+def check_config_file(force=False):
+    """Reload the config file if its mtime changed since the last check"""
+    now = time.monotonic()
+    if not force and now - config_file_state["checked"] < CONFIG_CHECK_INTERVAL:
+        return False
+    config_file_state["checked"] = now
+    
+    mtime = config_file_mtime()
+    if mtime == config_file_state["mtime"]:
+        return False
+    config_file_state["mtime"] = mtime
+    
+    file_values = read_config_file()
+    if file_values is None:
+        return False  # Keep the last good snapshot
+    return publish_settings(build_settings(settings_snapshot["values"], file_values), "config file")
+
+def settings():
+    """Current read-only settings snapshot"""
+    if CONFIG_FILE:
+        check_config_file()
+    return settings_snapshot["values"]
+
+def update_settings(changes, source, persist=True):
+    """
+    Validate and apply setting changes; raises ValueError
+    Changes go to the config file when one is used. Otherwise they ride
+    along with the next auto-save instead of rewriting the state now.
+    """
+    values = dict(settings())
+    for key, value in changes.items():
+        values[key] = validate_setting(key, value)
+    
+    if CONFIG_FILE:
+        file_values = read_config_file() or {}
+        file_values.update({key: values[key] for key in changes})
+        tmp_file = CONFIG_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(file_values, f, indent=2)
+        os.replace(tmp_file, CONFIG_FILE)
+        config_file_state["mtime"] = config_file_mtime()
+    
+    publish_settings(values, source)
+    if persist and not values["auto_save"]:
+        save_state()
+
+def start_runtime(profile_name, deadline=None):
+    """Set up logging, load state and start auto-save for a host profile"""
+    global auto_save_thread
+    profile.clear()
+    profile.update(PROFILES[profile_name], name=profile_name)
+    if deadline is not None:
+        profile["deadline"] = deadline or None
+    
+    setup_logging(
+        LOG_FORMAT if LOG_FORMAT is not None else profile["log_format"],
+        LOG_FILE if LOG_FILE is not None else profile["log_file"],
+    )
+    log.info("GOVERNMENT DATE BOT starting", extra={"fields": {
+        "profile": profile_name,
+        "deadline": profile["deadline"],
+        "token": "PRESENT" if TOKEN else "MISSING",
+        "channel_id": CHANNEL_ID,
+        "admin_id": ADMIN_USER_ID,
+    }})
+    
+    # Initialize state
+    load_state()
+    load_settings()
+    compact_command_history()
+    current_date = datetime.fromisoformat(state.get("current_date", now_est().isoformat()))
+    last_advance_date = datetime.fromisoformat(state.get("last_advance_date", now_est().date().isoformat())).date()
+    today = now_est().date()
+    
+    state_log.info("State loaded", extra={"fields": {
+        "current_date": current_date.strftime('%B %Y'),
+        "last_advance": last_advance_date.strftime('%Y-%m-%d'),
+        "today": today.strftime('%Y-%m-%d'),
+        "save_interval": save_interval,
+    }})
+    
+    # Start auto-save thread
+    auto_save_thread = threading.Thread(target=auto_save_worker, daemon=True)
+    auto_save_thread.start()
 
-print(f"Current in-game date: {current_date.strftime('%B %Y')}")
-print(f"Last advance: {last_advance_date.strftime('%Y-%m-%d')}")
-print(f"Today: {today.strftime('%Y-%m-%d')}")
-print(f"Auto-save: Every {save_interval} seconds")
+shutdown_done = False
 
-# Start auto-save thread
-auto_save_thread = threading.Thread(target=auto_save_worker, daemon=True)
-auto_save_thread.start()
+def shutdown():
+    """Stop auto-save, write the final state once and flush logs"""
+    global shutdown_done
+    if shutdown_done:
+        return
+    shutdown_done = True
+    log.info("Shutting down bot")
+    stop_event.set()
+    if auto_save_thread:
+        auto_save_thread.join(timeout=5)
+    save_state(durable=True)
+    log.info("Shutdown complete")
+    stop_logging()
 
 # ==================== UTILITY FUNCTIONS ====================
 
+def empty_stats():
+    """Fresh aggregate counters, kept up to date as history is logged"""
+    return {
+        "messages": 0,
+        "commands": 0,
+        "commands_by_user": {},
+        "commands_by_name": {},
+        "commands_by_hour": {},  # EST hour "0".."23"
+        "advancements": 0,
+        "advancements_by_type": {},
+        "months_advanced": 0,
+        "days_missed_total": 0,  # Over auto and scheduled advancements, not manual ones
+        "days_missed_count": 0,
+    }
+
+def record_command_stats(stats, user, command, timestamp):
+    """Fold one logged message into the aggregates"""
+    stats["messages"] = stats.get("messages", 0) + 1
+    if not command.startswith(("!", "/")):
+        return
+    
+    # Only registered names get their own counter, so keys stay bounded.
+    # Names and user ids repeat, so they are interned; free text is not.
+    name = command[1:].split(" ", 1)[0]
+    name = sys.intern(name) if name in COMMANDS else "other"
+    hour = str(datetime.fromisoformat(timestamp).astimezone(EST).hour)
+    
+    stats["commands"] = stats.get("commands", 0) + 1
+    for key, bucket in (("commands_by_user", user), ("commands_by_name", name), ("commands_by_hour", hour)):
+        counts = stats.setdefault(key, {})
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+def record_advancement_stats(stats, entry):
+    """Fold one advancement entry into the aggregates"""
+    stats["advancements"] = stats.get("advancements", 0) + 1
+    by_type = stats.setdefault("advancements_by_type", {})
+    by_type[entry["type"]] = by_type.get(entry["type"], 0) + 1
+    stats["months_advanced"] = stats.get("months_advanced", 0) + entry["months_advanced"]
+    if entry["type"] in ("auto", "scheduled"):
+        stats["days_missed_total"] = stats.get("days_missed_total", 0) + entry["days_missed"]
+        stats["days_missed_count"] = stats.get("days_missed_count", 0) + 1
+
+def rebuild_stats(source):
+    """Compute aggregates from whatever history a state still holds"""
+    stats = empty_stats()
+    for entry in source.get("command_history", []):
+        record_command_stats(stats, entry["user"], entry["command"], entry["timestamp"])
+    for entry in source.get("advancement_history", []):
+        record_advancement_stats(stats, entry)
+    return stats
+
+COMMAND_HISTORY_SIZE = 50
+ADVANCEMENT_HISTORY_SIZE = 100
+
+def clip_content(text, limit=None):
+    """Truncate user text to the history limit"""
+    limit = limit or settings()["history_content_limit"]
+    if len(text) > limit:
+        text = text[:limit - 1] + "…"
+    return text
+
+def compact_command_history():
+    """Apply the current content limit to entries loaded from older state files"""
+    for entry in state.get("command_history", []):
+        entry["user"] = sys.intern(entry["user"])
+        entry["command"] = clip_content(entry["command"])
+
+def history_footprint():
+    """Approximate memory and disk usage of the stored histories"""
+    seen = set()
+    
+    def size(obj):
+        # Interned user ids and shared keys are only counted once
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        return sys.getsizeof(obj)
+    
+    memory = 0
+    disk = 0
+    for key in ("command_history", "advancement_history"):
+        entries = state.get(key, [])
+        memory += size(entries)
+        for entry in entries:
+            memory += size(entry) + sum(size(k) + size(v) for k, v in entry.items())
+        disk += len(json.dumps(entries, indent=2).encode())
+    
+    # Worst case per command entry: every character at 4 bytes in memory
+    # and up to 6 bytes as a JSON escape on disk, plus fixed overhead
+    limit = settings()["history_content_limit"]
+    return {
+        "memory": memory,
+        "disk": disk,
+        "state_file": os.path.getsize(DATA_FILE) if os.path.exists(DATA_FILE) else 0,
+        "command_bound": COMMAND_HISTORY_SIZE * (limit * 4 + 400),
+        "command_disk_bound": COMMAND_HISTORY_SIZE * (limit * 6 + 150),
+    }
+
 def log_command(user_id, command):
     """Log command to history"""
     if "command_history" not in state:
         state["command_history"] = []
     
-    state["command_history"].append({
-        "user": str(user_id),
-        "command": command,
-        "timestamp": datetime.now(EST).isoformat()
-    })
+    entry = {
+        "user": sys.intern(str(user_id)),
+        "command": clip_content(command),
+        "timestamp": now_est().isoformat()
+    }
+    state["command_history"].append(entry)
+    record_command_stats(state.setdefault("stats", empty_stats()), entry["user"], entry["command"], entry["timestamp"])
     
     # Keep only last 50 commands
-    if len(state["command_history"]) > 50:
-        state["command_history"] = state["command_history"][-50:]
-    
-    if state.get("settings", {}).get("auto_save", True):
-        save_state()
+    if len(state["command_history"]) > COMMAND_HISTORY_SIZE:
+        state["command_history"] = state["command_history"][-COMMAND_HISTORY_SIZE:]
+    # No save here: this runs for every chat message, so the auto-save
+    # thread and the shutdown flush persist the history
 
-def log_advancement(days_missed, months_advanced, old_date, new_date):
+def log_advancement(days_missed, months_advanced, old_date, new_date, entry_type=None):
     """Log advancement to history"""
     if "advancement_history" not in state:
         state["advancement_history"] = []
     
-    state["advancement_history"].append({
-        "timestamp": datetime.now(EST).isoformat(),
+    entry = {
+        "timestamp": now_est().isoformat(),
         "days_missed": days_missed,
         "months_advanced": months_advanced,
         "old_date": old_date.isoformat(),
         "new_date": new_date.isoformat(),
-        "type": "auto" if days_missed > 1 else "scheduled"
-    })
+        "type": entry_type or ("auto" if days_missed > 1 else "scheduled")
+    }
+    state["advancement_history"].append(entry)
+    record_advancement_stats(state.setdefault("stats", empty_stats()), entry)
     
     # Keep only last 100 advancements
-    if len(state["advancement_history"]) > 100:
-        state["advancement_history"] = state["advancement_history"][-100:]
+    if len(state["advancement_history"]) > ADVANCEMENT_HISTORY_SIZE:
+        state["advancement_history"] = state["advancement_history"][-ADVANCEMENT_HISTORY_SIZE:]
+
+def parse_month_year(month_name, year):
+    """Parse "<Month> <Year>" arguments into the first of that month; raises ValueError"""
+    month_num = datetime.strptime(month_name, "%B").month
+    return datetime(int(year), month_num, 1, tzinfo=EST)
 
 def approximate_current_date(base_date, reference_time):
     """
@@ -214,7 +763,7 @@ def format_date_long(dt):
 
 def calculate_time_until(target_time):
     """Calculate time until a target time"""
-    now = datetime.now(EST)
+    now = now_est()
     if target_time <= now:
         target_time += timedelta(days=1)
     
@@ -227,30 +776,104 @@ def calculate_time_until(target_time):
     
     return hours, minutes, seconds
 
-async def get_notification_channel(client):
-    """Get the notification channel with proper checks"""
+# ==================== CALENDAR CLOCK ====================
+
+# How often the presence and pinned clock are re-rendered; edits are only
+# sent when the rendered text changed
+CLOCK_INTERVAL = int(os.getenv("CLOCK_INTERVAL", 60))
+# Minimum spacing between edits, so bursts of refresh requests coalesce
+# and we stay well inside Discord's presence and message edit rate limits
+CLOCK_MIN_EDIT_INTERVAL = int(os.getenv("CLOCK_MIN_EDIT_INTERVAL", 15))
+
+def render_presence(now):
+    """Presence text showing the approximate in-game day"""
+    current = datetime.fromisoformat(state["current_date"])
+    approx_date = approximate_current_date(current, now)
+    return f"{approx_date.strftime('%B %d, %Y')} | !help"
+
+def render_clock(now):
+    """Body of the pinned calendar clock message"""
+    current = datetime.fromisoformat(state["current_date"])
+    approx_date = approximate_current_date(current, now)
+    last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
+    return (
+        f"Government Calendar\n"
+        f"--------------------------------\n"
+        f"Current Approximation: {format_date_long(approx_date)}\n"
+        f"Base Period: {current.strftime('%B %Y')}\n"
+        f"Last Advance: {last_adv.strftime('%Y-%m-%d')}\n"
+        f"Rate: {settings()['months_per_day']} months per real day, at midnight EST\n"
+        f"--------------------------------\n"
+        f"This message updates automatically."
+    )
+
+# Resolved notification channel, kept until a gateway event invalidates it
+channel_cache = {
+    "resolved": False,
+    "channel": None,
+    "problem": None,  # Why the channel is unusable, shown by !channel
+    "checked_at": None,
+}
+
+def invalidate_channel_cache(reason):
+    """Force the next lookup to resolve the notification channel again"""
+    if channel_cache["resolved"]:
+        log.debug("Notification channel cache invalidated", extra={"fields": {"reason": reason}})
+    channel_cache["resolved"] = False
+
+async def resolve_notification_channel(client):
+    """
+    Look up the notification channel and validate the bot can post there
+    Returns: (channel, problem, cacheable)
+    """
     if not CHANNEL_ID:
-        return None
+        return None, "DISCORD_CHANNEL_ID is not set", True
     
-    try:
-        channel = client.get_channel(CHANNEL_ID)
-        if channel is None:
-            try:
-                channel = await client.fetch_channel(CHANNEL_ID)
-            except:
-                return None
-        
-        # Check permissions
-        if isinstance(channel, discord.TextChannel):
-            permissions = channel.permissions_for(channel.guild.me)
-            if not permissions.send_messages:
-                print(f"No send permission in #{channel.name}")
-                return None
-        
-        return channel
-    except Exception as e:
-        print(f"Error getting channel: {e}")
-        return None
+    channel = client.get_channel(CHANNEL_ID)
+    if channel is None:
+        try:
+            channel = await client.fetch_channel(CHANNEL_ID)
+        except discord.NotFound:
+            return None, f"Channel {CHANNEL_ID} does not exist", True
+        except discord.Forbidden:
+            return None, f"Bot cannot view channel {CHANNEL_ID}", True
+        except discord.HTTPException as e:
+            # Transient REST failure, try again on the next lookup
+            return None, f"Fetching channel failed: {e}", False
+    
+    if not isinstance(channel, discord.abc.Messageable):
+        return None, f"#{channel} is not a text channel", True
+    
+    # Check permissions
+    if isinstance(channel, (discord.TextChannel, discord.Thread)):
+        me = getattr(channel.guild, "me", None)
+        if me is None:
+            # Fetched over REST while its server isn't in this client's
+            # cache, e.g. it belongs to another shard worker
+            return None, f"Server of channel {CHANNEL_ID} is not available on this shard", False
+        permissions = channel.permissions_for(me)
+        if not permissions.view_channel:
+            return None, f"Missing View Channel permission in #{channel.name}", True
+        if not permissions.send_messages:
+            return None, f"Missing Send Messages permission in #{channel.name}", True
+    
+    return channel, None, True
+
+async def get_notification_channel(client):
+    """Get the notification channel, using the cached resolution when valid"""
+    if channel_cache["resolved"]:
+        return channel_cache["channel"]
+    
+    channel, problem, cacheable = await resolve_notification_channel(client)
+    channel_cache.update(
+        resolved=cacheable,
+        channel=channel,
+        problem=problem,
+        checked_at=now_est(),
+    )
+    if problem:
+        log.warning("Notification channel unusable", extra={"fields": {"problem": problem}})
+    return channel
 
 # ==================== ADVANCEMENT LOGIC ====================
 
@@ -259,7 +882,7 @@ async def check_and_advance_date(client, notification_channel=None):
     Check if date needs advancement and perform it
     Returns: (advanced, days_missed, months_advanced, new_date)
     """
-    now = datetime.now(EST)
+    now = now_est()
     today = now.date()
     
     last_advance_str = state.get("last_advance_date", today.isoformat())
@@ -267,20 +890,21 @@ async def check_and_advance_date(client, notification_channel=None):
     
     days_missed = (today - last_advance).days
     
-    if state.get("settings", {}).get("debug_mode", False):
-        print(f"DEBUG Advance Check:")
-        print(f"   Last advance: {last_advance}")
-        print(f"   Today: {today}")
-        print(f"   Days missed: {days_missed}")
-        print(f"   Current time: {now.strftime('%H:%M:%S EST')}")
+    advance_log.debug("Advance check", extra={"fields": {
+        "last_advance": last_advance.isoformat(),
+        "today": today.isoformat(),
+        "days_missed": days_missed,
+        "now": now.isoformat(),
+    }})
     
     # Advance if we've missed days
     if days_missed > 0:
-        print(f"ADVANCE NEEDED: {days_missed} day(s) missed")
+        advance_log.info("Advance needed", extra={"fields": {"days_missed": days_missed}})
         
         # Calculate advancement
-        months_per_day = state.get("settings", {}).get("months_per_day", 4)
-        max_per_run = state.get("settings", {}).get("max_advance_per_run", 12)
+        config = settings()
+        months_per_day = config["months_per_day"]
+        max_per_run = config["max_advance_per_run"]
         months_to_advance = min(months_per_day * days_missed, max_per_run)
         
         current_date_str = state.get("current_date", now.isoformat())
@@ -295,590 +919,2100 @@ async def check_and_advance_date(client, notification_channel=None):
         state["last_advance_date"] = today.isoformat()
         state["last_check_timestamp"] = now.isoformat()
         
-        if state.get("settings", {}).get("auto_save", True):
+        if settings()["auto_save"]:
             save_state()
         
-        print(f"ADVANCED: {current.strftime('%B %Y')} -> {new_date.strftime('%B %Y')}")
-        print(f"   Months: {months_to_advance}")
-        print(f"   Real days: {days_missed}")
+        client.request_clock_refresh()
+        
+        advance_log.info("Advanced", extra={"fields": {
+            "old_date": current.strftime('%B %Y'),
+            "new_date": new_date.strftime('%B %Y'),
+            "months": months_to_advance,
+            "days_missed": days_missed,
+        }})
         
         # Send notification
         if notification_channel and state.get("notifications_enabled", True):
-            try:
-                if days_missed == 1:
-                    message = (
-                        f"Government Time Advancement\n"
-                        f"1 real day has passed\n"
-                        f"Advanced by {months_to_advance} in-game months\n"
-                        f"New in-game date: {new_date.strftime('%B %Y')}\n"
-                        f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
-                        f"--------------------------------"
-                    )
-                else:
-                    remaining_days = days_missed - (months_to_advance // months_per_day)
-                    message = (
-                        f"Government Time Advancement\n"
-                        f"Real days passed: {days_missed}\n"
-                        f"In-game months advanced: {months_to_advance}\n"
-                        f"New in-game date: {new_date.strftime('%B %Y')}\n"
-                        f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
-                    )
-                    if remaining_days > 0:
-                        message += f"Note: {remaining_days} day(s) will advance tomorrow\n"
-                    message += "--------------------------------"
-                
-                await notification_channel.send(message)
-                print(f"Notification sent to channel")
-            except discord.Forbidden:
-                print(f"No permission to send in channel")
-            except Exception as e:
-                print(f"Failed to send notification: {e}")
+            if days_missed == 1:
+                message = (
+                    f"Government Time Advancement\n"
+                    f"1 real day has passed\n"
+                    f"Advanced by {months_to_advance} in-game months\n"
+                    f"New in-game date: {new_date.strftime('%B %Y')}\n"
+                    f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
+                    f"--------------------------------"
+                )
+            else:
+                remaining_days = days_missed - (months_to_advance // months_per_day)
+                message = (
+                    f"Government Time Advancement\n"
+                    f"Real days passed: {days_missed}\n"
+                    f"In-game months advanced: {months_to_advance}\n"
+                    f"New in-game date: {new_date.strftime('%B %Y')}\n"
+                    f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
+                )
+                if remaining_days > 0:
+                    message += f"Note: {remaining_days} day(s) will advance tomorrow\n"
+                message += "--------------------------------"
+            
+            client.queue_send(notification_channel, message)
         
         return True, days_missed, months_to_advance, new_date
     
     # Update timestamp even if no advancement
     state["last_check_timestamp"] = now.isoformat()
-    if state.get("settings", {}).get("auto_save", True):
+    if settings()["auto_save"]:
         save_state()
     
     return False, 0, 0, None
 
-# ==================== DISCORD BOT ====================
+# ==================== PERMISSIONS ====================
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True  # REMEMBER: You must enable "Server Members Intent" in Discord Developer Portal
+# Permission levels grantable to roles; "admin" implies "gm".
+# ADMIN_USER_ID always holds every permission. Roles only count in the
+# server that configured them, including for the shared calendar commands,
+# so in DMs only ADMIN_USER_ID holds any level.
+PERMISSION_LEVELS = ("admin", "gm")
 
-class GovernmentBot(discord.Client):
-    def __init__(self):
-        super().__init__(intents=intents)
-        self.notification_channel = None
-        self.start_time = datetime.now(EST)
-        
-    async def on_ready(self):
-        print("=" * 60)
-        print(f"BOT CONNECTED: {self.user}")
-        print(f"Bot ID: {self.user.id}")
-        print(f"Start time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S EST')}")
-        print(f"Servers: {len(self.guilds)}")
-        print("=" * 60)
+# Precomputed lookups so checks never walk roles on the hot path
+permission_index = {
+    "roles": {},    # role id -> set of levels
+    "members": {},  # user id -> {guild id -> set of levels}
+}
+
+def role_permissions(role_id):
+    """Levels granted to a role by the per-guild configuration"""
+    levels = set()
+    for config in state.get("permissions", {}).values():
+        for level in PERMISSION_LEVELS:
+            if role_id in config.get(level, []):
+                levels.add(level)
+    return levels
+
+def set_member_permissions(guild_id, user_id, levels):
+    """Record a member's levels in one guild"""
+    per_guild = permission_index["members"].setdefault(user_id, {})
+    if levels:
+        per_guild[guild_id] = levels
+    else:
+        per_guild.pop(guild_id, None)
+    
+    if not per_guild:
+        permission_index["members"].pop(user_id, None)
+
+def index_member(member):
+    """Recompute one member's levels from their roles"""
+    roles = permission_index["roles"]
+    levels = set()
+    for role in member.roles:
+        levels |= roles.get(role.id, set())
+    set_member_permissions(member.guild.id, member.id, levels)
+
+def index_role(role):
+    """Refresh a role's configured levels and every member holding it"""
+    levels = role_permissions(role.id)
+    if levels:
+        permission_index["roles"][role.id] = levels
+    else:
+        permission_index["roles"].pop(role.id, None)
+    for member in role.members:
+        index_member(member)
+
+def reindex_guild(guild):
+    """Recompute every indexed member of a guild, e.g. after a role vanished"""
+    for user_id, per_guild in list(permission_index["members"].items()):
+        if guild.id in per_guild:
+            member = guild.get_member(user_id)
+            if member:
+                index_member(member)
+            else:
+                set_member_permissions(guild.id, user_id, set())
+
+def rebuild_permission_index(client):
+    """Build the whole index from the role configuration and member cache"""
+    permission_index["roles"] = {}
+    permission_index["members"] = {}
+    
+    for config in state.get("permissions", {}).values():
+        for level in PERMISSION_LEVELS:
+            for role_id in config.get(level, []):
+                permission_index["roles"].setdefault(role_id, set()).add(level)
+    
+    for guild in client.guilds:
+        for role_id in permission_index["roles"]:
+            role = guild.get_role(role_id)
+            if role:
+                for member in role.members:
+                    index_member(member)
+    
+    log.info("Permission index built", extra={"fields": {
+        "roles": len(permission_index["roles"]),
+        "members": len(permission_index["members"]),
+    }})
+
+def has_permission(user, level):
+    """Check whether a user holds a permission level in the server they act in"""
+    if user.id == ADMIN_USER_ID:
+        return True
+    guild = getattr(user, "guild", None)
+    if guild is None:
+        return False
+    granted = permission_index["members"].get(user.id, {}).get(guild.id, ())
+    return level in granted or "admin" in granted
+
+# ==================== BATCH OPERATIONS ====================
+
+# Operation keyword -> number of arguments it takes
+BATCH_OPERATIONS = {
+    "setdate": 2,   # setdate <Month> <Year>
+    "advance": 1,   # advance <months>
+    "rate": 1,      # rate <months_per_day>
+}
+MAX_BATCH_ADVANCE = 1200  # Sanity limit per advance operation (100 years)
+
+def parse_batch(tokens):
+    """
+    Split tokens like "setdate May 2030; advance 8; rate 3" into operations
+    Returns: (operations, error)
+    """
+    tokens = [t.strip(";,") for t in tokens]
+    tokens = [t for t in tokens if t]
+    operations = []
+    i = 0
+    while i < len(tokens):
+        name = tokens[i].lower()
+        if name not in BATCH_OPERATIONS:
+            return None, f"Unknown operation '{tokens[i]}'"
+        count = BATCH_OPERATIONS[name]
+        op_args = tokens[i + 1:i + 1 + count]
+        if len(op_args) != count:
+            return None, f"'{name}' needs {count} argument(s)"
+        operations.append((name, op_args))
+        i += 1 + count
+    if not operations:
+        return None, "No operations given"
+    return operations, None
+
+def apply_batch(operations, dry_run=False):
+    """
+    Apply operations to a working copy of the calendar, then commit them
+    together with a single save (unless dry_run)
+    Returns: (summary_lines, error)
+    """
+    current = datetime.fromisoformat(state["current_date"])
+    rate = None
+    entries = []  # (days_missed, months, old_date, new_date, type)
+    lines = []
+    
+    for number, (name, op_args) in enumerate(operations, 1):
+        try:
+            if name == "setdate":
+                new_date = parse_month_year(op_args[0], op_args[1])
+                entries.append((0, 0, current, new_date, "set"))
+                lines.append(f"{number}. setdate {current.strftime('%B %Y')} -> {new_date.strftime('%B %Y')}")
+                current = new_date
+            elif name == "advance":
+                months = int(op_args[0])
+                if not 1 <= months <= MAX_BATCH_ADVANCE:
+                    return None, f"Operation {number}: advance must be between 1 and {MAX_BATCH_ADVANCE}"
+                new_date = current + relativedelta(months=months)
+                entries.append((0, months, current, new_date, "batch"))
+                lines.append(f"{number}. advance {months} -> {new_date.strftime('%B %Y')}")
+                current = new_date
+            elif name == "rate":
+                try:
+                    new_rate = validate_setting("months_per_day", op_args[0])
+                except ValueError as e:
+                    return None, f"Operation {number}: {e}"
+                lines.append(f"{number}. rate {rate or settings()['months_per_day']} -> {new_rate} months/day")
+                rate = new_rate
+        except ValueError:
+            return None, f"Operation {number}: invalid arguments for {name}: {' '.join(op_args)}"
+    
+    if dry_run:
+        return lines, None
+    
+    # Commit: every change lands together, followed by one save
+    for days_missed, months, old_date, new_date, entry_type in entries:
+        log_advancement(days_missed, months, old_date, new_date, entry_type)
+    state["current_date"] = current.isoformat()
+    if rate is not None:
+        update_settings({"months_per_day": rate}, "batch", persist=False)
+    if entries:
+        state["last_advance_date"] = now_est().date().isoformat()
+    save_state()
+    return lines, None
+
+def replay_advancements(history, base_date=None):
+    """
+    Replay advancement history from a base date in a single pass
+    Without a base, replay starts at the first entry and resyncs to the
+    recorded date after a gap; with one, every advance applies to the
+    base and only a "set" entry moves the replay to a new date.
+    Returns: (replayed_date, problems) where problems are (index, message)
+    """
+    problems = []
+    if not history:
+        return base_date, problems
+    
+    replayed = base_date
+    recorded = None  # new_date of the previous entry, to spot chain breaks
+    for index, entry in enumerate(history):
+        try:
+            old_date = datetime.fromisoformat(entry["old_date"])
+            new_date = datetime.fromisoformat(entry["new_date"])
+            months = int(entry["months_advanced"])
+        except (KeyError, TypeError, ValueError):
+            problems.append((index, "malformed entry"))
+            continue
         
-        # Get current state
-        current = datetime.fromisoformat(state.get("current_date", datetime.now(EST).isoformat()))
-        last_adv = datetime.fromisoformat(state.get("last_advance_date", datetime.now(EST).date().isoformat())).date()
+        if replayed is None:
+            replayed = old_date
         
-        print(f"Current date: {current.strftime('%B %Y')}")
-        print(f"Last advance: {last_adv.strftime('%Y-%m-%d')}")
-        print(f"Notifications: {'ON' if state.get('notifications_enabled', True) else 'OFF'}")
+        # Compare wall-clock dates; stored offsets differ across DST
+        if recorded is not None and old_date.date() != recorded.date():
+            # Untracked change (e.g. a setdate before they were logged)
+            problems.append((index, f"starts at {old_date.strftime('%B %Y')}, previous entry ended at {recorded.strftime('%B %Y')}"))
+            if base_date is None:
+                replayed = old_date
+        recorded = new_date
         
-        # Get notification channel
-        self.notification_channel = await get_notification_channel(self)
-        if self.notification_channel:
-            print(f"Notification channel: #{self.notification_channel.name}")
-        else:
-            print(f"No notification channel or no permissions")
+        if entry.get("type") == "set":
+            replayed = new_date
+            continue
         
-        # Set bot status
-        await self.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.watching,
-                name=f"{current.strftime('%B %Y')} | !help"
-            )
+        if (old_date + relativedelta(months=months)).date() != new_date.date():
+            problems.append((index, f"{months} months from {old_date.strftime('%B %Y')} recorded as {new_date.strftime('%B %Y')}"))
+        replayed = replayed + relativedelta(months=months)
+    
+    return replayed, problems
+
+# ==================== COMMANDS ====================
+
+# Shared handlers for the prefix (!command) and slash (/command) interfaces.
+# Each handler takes (client, author, channel, args) and returns the reply text.
+COMMANDS = {}
+
+NOT_AUTHORIZED = "You are not authorized to use this command."
+DRAINING = "The bot is restarting, try again in a minute."
+TOO_LONG = "That command is too long (limit {limit} characters)."
+COMMAND_FAILED = "❌ ERROR: Command failed, check the bot logs."
+UNKNOWN_COMMAND = (
+    "Unknown command. Type !help for available commands.\n"
+    "Did you mean !date or !status?"
+)
+
+def command(name, description, permission=None, defer=False, local=False):
+    """Register a command handler shared by the prefix and slash paths"""
+    def decorator(handler):
+        COMMANDS[name] = {
+            "handler": handler,
+            "description": description,
+            "permission": permission,  # Required level, or None for everyone
+            "defer": defer,  # Slow commands defer their slash response
+            "local": local,  # Needs the gateway cache, so shard workers run it themselves
+        }
+        return handler
+    return decorator
+
+def is_authorized(user, entry):
+    """Check whether a user may run a registered command"""
+    return entry["permission"] is None or has_permission(user, entry["permission"])
+
+def reply_kwargs(response):
+    """Handlers return reply text, or a dict of send() kwargs for attachments"""
+    if isinstance(response, dict):
+        return response
+    return {"content": response}
+
+async def dispatch_command(client, name, author, channel, args):
+    """Authorize and run a registered command, returning the reply text"""
+    entry = COMMANDS.get(name)
+    if entry is None:
+        return UNKNOWN_COMMAND
+    if not is_authorized(author, entry):
+        return NOT_AUTHORIZED
+    return await entry["handler"](client, author, channel, args)
+
+@command("date", "Show current date information")
+async def cmd_date(client, author, channel, args):
+    current = datetime.fromisoformat(state["current_date"])
+    now = now_est()
+    approx_date = approximate_current_date(current, now)
+    time_fmt = state.get("time_format", "12hr")
+    
+    last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
+    days_since = (now.date() - last_adv).days
+    
+    # Calculate next midnight
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), dt_time(0, 0, tzinfo=EST))
+    hours, minutes, seconds = calculate_time_until(next_midnight)
+    
+    return (
+        f"Current Date Information\n"
+        f"--------------------------------\n"
+        f"Base Period: {current.strftime('%B %Y')}\n"
+        f"Current Approximation: {approx_date.strftime('%B %d, %Y')}\n"
+        f"Real Time: {format_time(now, time_fmt)} EST\n"
+        f"\n"
+        f"Advancement Status\n"
+        f"--------------------------------\n"
+        f"Last Advance: {last_adv.strftime('%Y-%m-%d')} ({days_since} day{'s' if days_since != 1 else ''} ago)\n"
+        f"Next Auto-Advance: {hours}h {minutes}m {seconds}s\n"
+        f"Rate: {settings()['months_per_day']} months per real day\n"
+        f"Max per run: {settings()['max_advance_per_run']} months\n"
+        f"\n"
+        f"The date progresses through {current.strftime('%B %Y')} in real-time."
+    )
+
+@command("send", "Send the advancement notice to the notification channel", permission="gm", defer=True)
+async def cmd_send(client, author, channel, args):
+    # Get notification channel (a reference only, on the shard coordinator)
+    target = await client.notification_target()
+    if not target:
+        return "ERROR: Cannot access notification channel. Check permissions and channel ID."
+    
+    # Get current date info
+    current = datetime.fromisoformat(state["current_date"])
+    now = now_est()
+    
+    # Create the message to send
+    message_content = (
+        f"Government Time Advancement\n"
+        f"1 real day has passed\n"
+        f"Advanced by 4 in-game months\n"
+        f"New in-game date: {current.strftime('%B %Y')}\n"
+        f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
+        f"--------------------------------"
+    )
+    
+    # Same path as automatic notifications, so with shard workers the one
+    # holding the channel delivers it
+    client.queue_send(target, message_content)
+    command_log.info("Force sent notification", extra={"fields": {"channel": target.id}})
+    return f"✅ Message queued for <#{target.id}>"
+
+@command("advance", "Manually advance the date", permission="gm")
+async def cmd_advance(client, author, channel, args):
+    months_to_advance = settings()["months_per_day"]
+    
+    if args:
+        try:
+            months_to_advance = int(args[0])
+            # Limit to reasonable amount
+            max_months = settings()["max_advance_per_run"] * 3
+            months_to_advance = min(max(1, months_to_advance), max_months)
+        except ValueError:
+            return "Invalid number. Usage: !advance [months]"
+    
+    current = datetime.fromisoformat(state["current_date"])
+    new_date = current + relativedelta(months=months_to_advance)
+    
+    # Log the manual advancement
+    log_advancement(0, months_to_advance, current, new_date, "manual")
+    
+    # Update state
+    state["current_date"] = new_date.isoformat()
+    state["last_advance_date"] = now_est().date().isoformat()
+    save_state()
+    
+    # Update bot status
+    client.request_clock_refresh()
+    
+    return (
+        f"Manual Advance Complete\n"
+        f"--------------------------------\n"
+        f"Advanced by: {months_to_advance} month{'s' if months_to_advance != 1 else ''}\n"
+        f"New date: {new_date.strftime('%B %Y')}\n"
+        f"Time: {now_est().strftime('%I:%M:%S %p EST')}\n"
+        f"By: {author.mention}\n"
+        f"\n"
+        f"Next auto-advance will occur at midnight EST."
+    )
+
+@command("force", "Force an auto-advance check", permission="gm", defer=True)
+async def cmd_force(client, author, channel, args):
+    advanced, days_missed, months_advanced, new_date = await check_and_advance_date(
+        client, channel  # Use command channel
+    )
+    
+    if advanced:
+        return (
+            f"Force Advance Completed\n"
+            f"--------------------------------\n"
+            f"Days missed: {days_missed}\n"
+            f"Months advanced: {months_advanced}\n"
+            f"New date: {new_date.strftime('%B %Y')}\n"
+            f"Time: {now_est().strftime('%I:%M:%S %p EST')}"
         )
-        
-        # Check for advancements
-        print("Checking for missed advancements...")
-        advanced, days_missed, months_advanced, new_date = await check_and_advance_date(
-            self, self.notification_channel
+    
+    last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
+    return (
+        f"No Advancement Needed\n"
+        f"--------------------------------\n"
+        f"Last advance: {last_adv.strftime('%Y-%m-%d')}\n"
+        f"Today: {now_est().date().strftime('%Y-%m-%d')}\n"
+        f"Current time: {now_est().strftime('%I:%M:%S %p EST')}"
+    )
+
+@command("setdate", "Set a custom in-game date", permission="gm")
+async def cmd_setdate(client, author, channel, args):
+    if len(args) != 2:
+        return (
+            "Usage: !setdate <Month> <Year>\n"
+            "Example: !setdate May 2026\n"
+            "Example: !setdate December 2027"
         )
-        
-        if advanced:
-            print(f"Auto-advance completed: {months_advanced} months")
-            # Update status with new date
-            await self.change_presence(
-                activity=discord.Activity(
-                    type=discord.ActivityType.watching,
-                    name=f"{new_date.strftime('%B %Y')} | !help"
-                )
-            )
+    
+    try:
+        new_date = parse_month_year(args[0], args[1])
+    except ValueError:
+        return (
+            "Invalid date format.\n"
+            "Valid months: January, February, March, April, May, June, July, "
+            "August, September, October, November, December\n"
+            "Example: !setdate May 2026"
+        )
+    
+    # Get old date for logging
+    old_date = datetime.fromisoformat(state["current_date"])
+    log_advancement(0, 0, old_date, new_date, "set")
+    
+    # Update state
+    state["current_date"] = new_date.isoformat()
+    state["last_advance_date"] = now_est().date().isoformat()
+    save_state()
+    
+    # Update bot status
+    client.request_clock_refresh()
+    
+    return (
+        f"Date Successfully Set\n"
+        f"--------------------------------\n"
+        f"New date: {new_date.strftime('%B %Y')}\n"
+        f"Previous date: {old_date.strftime('%B %Y')}\n"
+        f"Last advance reset to: {now_est().date().strftime('%Y-%m-%d')}\n"
+        f"By: {author.mention}"
+    )
+
+@command("status", "Show bot status")
+async def cmd_status(client, author, channel, args):
+    current = datetime.fromisoformat(state["current_date"])
+    last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
+    today = now_est().date()
+    days_since = (today - last_adv).days
+    
+    # Calculate next midnight
+    next_midnight = datetime.combine(today + timedelta(days=1), dt_time(0, 0, tzinfo=EST))
+    hours, minutes, seconds = calculate_time_until(next_midnight)
+    
+    # Calculate uptime
+    uptime = now_est() - client.start_time
+    uptime_str = f"{uptime.days}d {uptime.seconds//3600}h {(uptime.seconds%3600)//60}m"
+    
+    return (
+        f"Bot Status\n"
+        f"--------------------------------\n"
+        f"Bot: {client.user}\n"
+        f"ID: {client.user.id}\n"
+        f"Uptime: {uptime_str}\n"
+        f"Servers: {len(client.guilds)}\n"
+        f"\n"
+        f"Date Status\n"
+        f"--------------------------------\n"
+        f"Current date: {current.strftime('%B %Y')}\n"
+        f"Last advance: {last_adv.strftime('%Y-%m-%d')}\n"
+        f"Days since advance: {days_since}\n"
+        f"Next auto-advance: {hours}h {minutes}m {seconds}s\n"
+        f"Catch-up: {client.catchup_status()}\n"
+        f"\n"
+        f"Settings\n"
+        f"--------------------------------\n"
+        f"Notifications: {'ON' if state.get('notifications_enabled', True) else 'OFF'}\n"
+        f"Time format: {state.get('time_format', '12hr')}\n"
+        f"Rate: {settings()['months_per_day']} months/day\n"
+        f"Max/run: {settings()['max_advance_per_run']} months\n"
+        f"Auto-save: {'ON' if settings()['auto_save'] else 'OFF'}\n"
+        f"\n"
+        f"Admin: <@{ADMIN_USER_ID}>"
+    )
+
+@command("notifications", "Toggle advancement notifications", permission="admin")
+async def cmd_notifications(client, author, channel, args):
+    if args:
+        setting = args[0].lower()
+        if setting in ["on", "enable", "yes", "true"]:
+            state["notifications_enabled"] = True
+            response = "Notifications ENABLED"
+        elif setting in ["off", "disable", "no", "false"]:
+            state["notifications_enabled"] = False
+            response = "Notifications DISABLED"
         else:
-            print("No advancement needed")
-        
-        print("=" * 60)
-        
-    async def on_message(self, message):
-        # Ignore bot messages
-        if message.author.bot:
-            return
-        
-        # Log command
-        log_command(message.author.id, message.content)
-        
-        # Debug logging
-        if state.get("settings", {}).get("debug_mode", False):
-            print(f"[DEBUG] {message.author} in #{message.channel}: {message.content}")
+            response = f"Invalid setting. Use !notifications on or !notifications off"
+    else:
+        # Toggle
+        current = state.get("notifications_enabled", True)
+        state["notifications_enabled"] = not current
+        response = f"Notifications {'ENABLED' if not current else 'DISABLED'}"
+    
+    save_state()
+    return response
+
+@command("timeformat", "Change the time format")
+async def cmd_timeformat(client, author, channel, args):
+    if args:
+        new_format = args[0].lower()
+        if new_format in ["12hr", "12", "12h"]:
+            state["time_format"] = "12hr"
+            response = "Time format set to 12-hour (AM/PM)"
+        elif new_format in ["24hr", "24", "24h"]:
+            state["time_format"] = "24hr"
+            response = "Time format set to 24-hour"
         else:
-            print(f"[{message.author}]: {message.content}")
+            response = "Invalid format. Use 12hr or 24hr"
+    else:
+        # Toggle
+        current = state.get("time_format", "12hr")
+        state["time_format"] = "24hr" if current == "12hr" else "12hr"
+        response = f"Time format changed to {state['time_format']}"
+    
+    save_state()
+    return response
+
+@command("save", "Manually save state", permission="admin")
+async def cmd_save(client, author, channel, args):
+    if save_state():
+        last_save = datetime.fromtimestamp(last_save_time).strftime('%Y-%m-%d %H:%M:%S')
+        return f"State saved successfully at {last_save}"
+    return "Failed to save state"
+
+@command("debug", "Toggle debug mode", permission="admin")
+async def cmd_debug(client, author, channel, args):
+    current = settings()["debug_mode"]
+    
+    if args:
+        try:
+            enabled = validate_setting("debug_mode", args[0])
+        except ValueError:
+            return f"Debug mode is currently {'ENABLED' if current else 'DISABLED'}"
+    else:
+        # Toggle
+        enabled = not current
+    
+    update_settings({"debug_mode": enabled}, "!debug")
+    return f"Debug mode {'ENABLED' if enabled else 'DISABLED'}"
+
+# Discord rejects messages over 2000 characters
+MAX_REPLY_LENGTH = 1900
+HISTORY_LINE_LIMIT = 150
+
+@command("history", "View command or advancement history", permission="admin")
+async def cmd_history(client, author, channel, args):
+    history_type = "commands" if not args else args[0].lower()
+    
+    if history_type in ["cmd", "commands", "command"]:
+        history = state.get("command_history", [])
+        if not history:
+            return "No command history recorded."
         
-        # ==================== COMMAND HANDLING ====================
+        # Show last 10 commands, newest first, within one message
+        recent = history[-10:]
+        header = "Recent Commands (Last 10)\n--------------------------------\n"
+        lines = []
+        for entry in reversed(recent):
+            dt = datetime.fromisoformat(entry["timestamp"])
+            content = discord.utils.escape_mentions(clip_content(entry["command"], HISTORY_LINE_LIMIT))
+            line = f"• <t:{int(dt.timestamp())}:R> - <@{entry['user']}>: {content}\n"
+            if len(header) + sum(map(len, lines)) + len(line) > MAX_REPLY_LENGTH:
+                break
+            lines.append(line)
+        return {
+            "content": header + "".join(reversed(lines)),
+            "allowed_mentions": discord.AllowedMentions.none(),
+        }
+    
+    if history_type in ["adv", "advance", "advances", "advancement"]:
+        history = state.get("advancement_history", [])
+        if not history:
+            return "No advancement history recorded."
         
-        # !date - Show current date
-        if message.content == "!date":
-            current = datetime.fromisoformat(state["current_date"])
-            now = datetime.now(EST)
-            approx_date = approximate_current_date(current, now)
-            time_fmt = state.get("time_format", "12hr")
-            
-            last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
-            days_since = (now.date() - last_adv).days
-            
-            # Calculate next midnight
-            next_midnight = datetime.combine(now.date() + timedelta(days=1), dt_time(0, 0, tzinfo=EST))
-            hours, minutes, seconds = calculate_time_until(next_midnight)
-            
-            response = (
-                f"Current Date Information\n"
-                f"--------------------------------\n"
-                f"Base Period: {current.strftime('%B %Y')}\n"
-                f"Current Approximation: {approx_date.strftime('%B %d, %Y')}\n"
-                f"Real Time: {format_time(now, time_fmt)} EST\n"
-                f"\n"
-                f"Advancement Status\n"
-                f"--------------------------------\n"
-                f"Last Advance: {last_adv.strftime('%Y-%m-%d')} ({days_since} day{'s' if days_since != 1 else ''} ago)\n"
-                f"Next Auto-Advance: {hours}h {minutes}m {seconds}s\n"
-                f"Rate: {state.get('settings', {}).get('months_per_day', 4)} months per real day\n"
-                f"Max per run: {state.get('settings', {}).get('max_advance_per_run', 12)} months\n"
-                f"\n"
-                f"The date progresses through {current.strftime('%B %Y')} in real-time."
+        # Show last 5 advancements
+        recent = history[-5:]
+        response = "Recent Advancements (Last 5)\n--------------------------------\n"
+        for entry in recent:
+            dt = datetime.fromisoformat(entry["timestamp"])
+            old_date = datetime.fromisoformat(entry["old_date"])
+            new_date = datetime.fromisoformat(entry["new_date"])
+            response += (
+                f"• <t:{int(dt.timestamp())}:R>\n"
+                f"  {old_date.strftime('%B %Y')} -> {new_date.strftime('%B %Y')}\n"
+                f"  {entry['months_advanced']} months ({entry['days_missed']} days)\n"
+                f"  Type: {entry['type']}\n"
             )
-            await message.channel.send(response)
+        return response
+    
+    if history_type in ["usage", "size"]:
+        usage = history_footprint()
+        config = settings()
+        return (
+            f"History Footprint\n"
+            f"--------------------------------\n"
+            f"Commands: {len(state.get('command_history', []))}/{COMMAND_HISTORY_SIZE} "
+            f"(content limit {config['history_content_limit']} chars)\n"
+            f"Advancements: {len(state.get('advancement_history', []))}/{ADVANCEMENT_HISTORY_SIZE}\n"
+            f"Memory: {usage['memory'] / 1024:.1f} KB\n"
+            f"On disk: {usage['disk'] / 1024:.1f} KB (state file {usage['state_file'] / 1024:.1f} KB)\n"
+            f"Command history bound: {usage['command_bound'] / 1024:.0f} KB memory, "
+            f"{usage['command_disk_bound'] / 1024:.0f} KB disk\n"
+            f"Max command length: {config['max_command_length']} chars"
+        )
+    
+    return "Invalid history type. Use !history commands, !history advances or !history usage"
 
-        # Add this to your command handling section (around line where !advance is)
+@command("channel", "Show notification channel status", permission="admin", local=True)
+async def cmd_channel(client, author, channel, args):
+    if args and args[0].lower() == "refresh":
+        invalidate_channel_cache("refresh command")
+        await get_notification_channel(client)
+    
+    if channel_cache["checked_at"] is None:
+        return "Notification channel has not been resolved yet. Use !channel refresh"
+    
+    target = channel_cache["channel"]
+    return (
+        f"Notification Channel\n"
+        f"--------------------------------\n"
+        f"Channel ID: {CHANNEL_ID}\n"
+        f"Resolved: {f'#{target.name}' if target else 'No'}\n"
+        f"Status: {channel_cache['problem'] or 'OK'}\n"
+        f"Checked: {channel_cache['checked_at'].strftime('%Y-%m-%d %I:%M:%S %p EST')}\n"
+        f"Cached: {'Yes' if channel_cache['resolved'] else 'No (will retry)'}"
+    )
 
-        elif message.content == "!send":
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            # Get notification channel
-            channel = await get_notification_channel(self)
-            if not channel:
-                await message.channel.send("ERROR: Cannot access notification channel. Check permissions and channel ID.")
-                return
-            
-            # Get current date info
-            current = datetime.fromisoformat(state["current_date"])
-            now = datetime.now(EST)
-            
-            # Create the message to send
-            message_content = (
-                f"Government Time Advancement\n"
-                f"1 real day has passed\n"
-                f"Advanced by 4 in-game months\n"
-                f"New in-game date: {current.strftime('%B %Y')}\n"
-                f"Time: {now.strftime('%I:%M:%S %p EST')}\n"
-                f"--------------------------------"
-            )
-            
-            try:
-                # Force send to notification channel
-                await channel.send(message_content)
-                await message.channel.send(f"✅ Message sent to #{channel.name}")
-                print(f"FORCE SENT: Message sent to #{channel.name}")
-            except discord.Forbidden:
-                await message.channel.send("❌ ERROR: Bot doesn't have permission to send messages in that channel.")
-            except Exception as e:
-                await message.channel.send(f"❌ ERROR: Failed to send message: {str(e)}")
-            
-        # !advance [months] - Manual advance (admin)
-        elif message.content.startswith("!advance"):
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            parts = message.content.split()
-            months_to_advance = state.get("settings", {}).get("months_per_day", 4)
-            
-            if len(parts) > 1:
-                try:
-                    months_to_advance = int(parts[1])
-                    # Limit to reasonable amount
-                    max_months = state.get("settings", {}).get("max_advance_per_run", 12) * 3
-                    months_to_advance = min(max(1, months_to_advance), max_months)
-                except ValueError:
-                    await message.channel.send("Invalid number. Usage: !advance [months]")
-                    return
-            
-            current = datetime.fromisoformat(state["current_date"])
-            new_date = current + relativedelta(months=months_to_advance)
-            
-            # Log the manual advancement
-            log_advancement(0, months_to_advance, current, new_date)
-            
-            # Update state
-            state["current_date"] = new_date.isoformat()
-            state["last_advance_date"] = datetime.now(EST).date().isoformat()
-            save_state()
-            
-            # Update bot status
-            await self.change_presence(
-                activity=discord.Activity(
-                    type=discord.ActivityType.watching,
-                    name=f"{new_date.strftime('%B %Y')} | !help"
-                )
-            )
-            
-            response = (
-                f"Manual Advance Complete\n"
-                f"--------------------------------\n"
-                f"Advanced by: {months_to_advance} month{'s' if months_to_advance != 1 else ''}\n"
-                f"New date: {new_date.strftime('%B %Y')}\n"
-                f"Time: {datetime.now(EST).strftime('%I:%M:%S %p EST')}\n"
-                f"By: {message.author.mention}\n"
-                f"\n"
-                f"Next auto-advance will occur at midnight EST."
-            )
-            await message.channel.send(response)
-            
-        # !force - Force advance check (admin)
-        elif message.content == "!force":
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            await message.channel.send("Force checking for advancements...")
-            advanced, days_missed, months_advanced, new_date = await check_and_advance_date(
-                self, message.channel  # Use command channel
-            )
+@command("roles", "Configure admin and GM roles", permission="admin", local=True)
+async def cmd_roles(client, author, channel, args):
+    guild = getattr(channel, "guild", None)
+    if guild is None:
+        return "Roles can only be configured from a server channel."
+    # Admin roles never reach across servers: only this server's admins
+    # (or the owner) may edit its configuration
+    if author.id != ADMIN_USER_ID and not (getattr(author, "guild", None) == guild and has_permission(author, "admin")):
+        return NOT_AUTHORIZED
+    
+    config = state.setdefault("permissions", {}).setdefault(str(guild.id), {"admin": [], "gm": []})
+    
+    if not args:
+        def names(role_ids):
+            return ", ".join(
+                f"@{guild.get_role(r).name}" if guild.get_role(r) else str(r) for r in role_ids
+            ) or "None"
+        return (
+            f"Permission Roles\n"
+            f"--------------------------------\n"
+            f"Admin: {names(config.get('admin', []))}\n"
+            f"GM: {names(config.get('gm', []))}\n"
+            f"Owner: <@{ADMIN_USER_ID}>"
+        )
+    
+    usage = "Usage: !roles [add/remove] [admin/gm] [@role]"
+    if len(args) != 3 or args[0].lower() not in ("add", "remove") or args[1].lower() not in PERMISSION_LEVELS:
+        return usage
+    
+    action, level = args[0].lower(), args[1].lower()
+    role_digits = "".join(ch for ch in args[2] if ch.isdigit())
+    role = guild.get_role(int(role_digits)) if role_digits else None
+    if role is None:
+        return f"Unknown role. {usage}"
+    
+    role_ids = config.setdefault(level, [])
+    if action == "add" and role.id not in role_ids:
+        role_ids.append(role.id)
+    elif action == "remove" and role.id in role_ids:
+        role_ids.remove(role.id)
+    
+    save_state()
+    index_role(role)
+    
+    return f"{'Added' if action == 'add' else 'Removed'} @{role.name} {'to' if action == 'add' else 'from'} {level} roles"
+
+@command("clock", "Pin a live calendar clock in this channel", permission="gm", defer=True, local=True)
+async def cmd_clock(client, author, channel, args):
+    clock = state.get("clock") or {}
+    action = args[0].lower() if args else None
+    
+    if action == "here":
+        text = render_clock(now_est())
+        try:
+            posted = await channel.send(text)
+        except discord.Forbidden:
+            return "❌ ERROR: Bot doesn't have permission to send messages here."
+        
+        # Replace any previous clock
+        old_channel = client.get_channel(clock.get("channel_id") or 0)
+        if old_channel and clock.get("message_id"):
+            try:
+                await old_channel.get_partial_message(clock["message_id"]).unpin()
+            except discord.HTTPException:
+                pass
+        
+        state["clock"] = {"channel_id": channel.id, "message_id": posted.id}
+        save_state()
+        client.last_clock_text = text
+        
+        try:
+            await posted.pin()
+        except discord.HTTPException:
+            return "Calendar clock posted, but it could not be pinned (needs Manage Messages)."
+        return "Calendar clock posted and pinned."
+    
+    if action == "off":
+        if not clock.get("message_id"):
+            return "Calendar clock is not enabled."
+        old_channel = client.get_channel(clock["channel_id"])
+        if old_channel:
+            try:
+                await old_channel.get_partial_message(clock["message_id"]).unpin()
+            except discord.HTTPException:
+                pass
+        state["clock"] = {}
+        save_state()
+        client.last_clock_text = None
+        return "Calendar clock disabled. The old message will no longer update."
+    
+    if args:
+        return "Usage: !clock [here/off]"
+    if not clock.get("message_id"):
+        return "Calendar clock is not enabled. Use !clock here to pin one."
+    return (
+        f"Calendar clock: <#{clock['channel_id']}>\n"
+        f"Updates every {CLOCK_INTERVAL}s when the date changes."
+    )
+
+@command("batch", "Apply several calendar operations at once", permission="admin")
+async def cmd_batch(client, author, channel, args):
+    dry_run = bool(args) and args[0].lower() in ("dry", "dry-run", "preview")
+    if dry_run:
+        args = args[1:]
+    
+    operations, error = parse_batch(args)
+    if error:
+        return (
+            f"{error}\n"
+            "Usage: !batch [dry] setdate <Month> <Year>; advance <months>; rate <months_per_day>\n"
+            "Example: !batch setdate May 2030; advance 8; rate 3"
+        )
+    
+    lines, error = apply_batch(operations, dry_run)
+    if error:
+        return f"Batch aborted, nothing changed.\n{error}"
+    
+    if not dry_run:
+        client.request_clock_refresh()
+    
+    return (
+        f"{'Batch Preview (not applied)' if dry_run else 'Batch Applied'}\n"
+        f"--------------------------------\n"
+        + "\n".join(lines)
+        + ("" if dry_run else f"\nBy: {author.mention}")
+    )
+
+@command("replay", "Check current date against the advancement history", permission="admin")
+async def cmd_replay(client, author, channel, args):
+    fix = bool(args) and args[0].lower() == "fix"
+    if fix:
+        args = args[1:]
+    
+    base_date = None
+    if args:
+        usage = "Usage: !replay [fix] [<Month> <Year>]"
+        if len(args) != 2:
+            return usage
+        try:
+            base_date = parse_month_year(args[0], args[1])
+        except ValueError:
+            return usage
+    
+    history = state.get("advancement_history", [])
+    if not history:
+        return "No advancement history recorded."
+    
+    replayed, problems = replay_advancements(history, base_date)
+    current = datetime.fromisoformat(state["current_date"])
+    
+    response = (
+        f"Advancement Replay\n"
+        f"--------------------------------\n"
+        f"Entries checked: {len(history)}\n"
+        f"Replayed date: {replayed.strftime('%B %Y') if replayed else 'unknown'}\n"
+        f"Current date: {current.strftime('%B %Y')}\n"
+        f"Problems: {len(problems)}\n"
+    )
+    for index, problem in problems[:10]:
+        response += f"• Entry {index + 1}: {problem}\n"
+    if len(problems) > 10:
+        response += f"• ... and {len(problems) - 10} more\n"
+    
+    if replayed is None:
+        # Nothing to rebuild from, so never offer or apply a fix
+        response += "No valid advancement entries to replay. Pass a base date: !replay [fix] <Month> <Year>"
+    elif fix and replayed.date() != current.date():
+        state["current_date"] = replayed.isoformat()
+        save_state()
+        client.request_clock_refresh()
+        response += f"Current date rebuilt to {replayed.strftime('%B %Y')}"
+    elif replayed.date() == current.date():
+        response += "Current date matches the history."
+    else:
+        response += "Use !replay fix to rebuild the current date."
+    return response
+
+@command("stats", "Show usage and advancement statistics", permission="gm")
+async def cmd_stats(client, author, channel, args):
+    stats = state.get("stats") or empty_stats()
+    
+    def top(counts, n, label):
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return "\n".join(f"• {label(key)}: {count}" for key, count in ranked) or "• None yet"
+    
+    by_type = stats.get("advancements_by_type", {})
+    samples = stats.get("days_missed_count", 0)
+    avg_missed = stats.get("days_missed_total", 0) / samples if samples else 0
+    
+    return (
+        f"Statistics\n"
+        f"--------------------------------\n"
+        f"Messages logged: {stats.get('messages', 0)}\n"
+        f"Commands run: {stats.get('commands', 0)}\n"
+        f"\n"
+        f"Top Users\n"
+        f"{top(stats.get('commands_by_user', {}), 5, lambda user: f'<@{user}>')}\n"
+        f"\n"
+        f"Top Commands\n"
+        f"{top(stats.get('commands_by_name', {}), 5, lambda name: name if name == 'other' else f'!{name}')}\n"
+        f"\n"
+        f"Busiest Hours (EST)\n"
+        f"{top(stats.get('commands_by_hour', {}), 3, lambda hour: f'{int(hour):02d}:00')}\n"
+        f"\n"
+        f"Advancements\n"
+        f"--------------------------------\n"
+        f"Total: {stats.get('advancements', 0)} ({stats.get('months_advanced', 0)} months)\n"
+        f"Catch-up (auto): {by_type.get('auto', 0)}\n"
+        f"Scheduled: {by_type.get('scheduled', 0)}\n"
+        f"Manual advance/set/batch: {by_type.get('manual', 0) + by_type.get('set', 0) + by_type.get('batch', 0)}\n"
+        f"Average days missed: {avg_missed:.2f}"
+    )
+
+EXPORT_KINDS = {
+    # kind -> (columns, row source)
+    "commands": (["timestamp", "user", "command"], lambda: state.get("command_history", [])),
+    "advances": (
+        ["timestamp", "type", "days_missed", "months_advanced", "old_date", "new_date"],
+        lambda: state.get("advancement_history", []),
+    ),
+    "stats": (["metric", "key", "value"], lambda: iter_stats_rows(state.get("stats") or empty_stats())),
+}
+
+def iter_stats_rows(stats):
+    """Flatten the aggregates into (metric, key, value) rows"""
+    for metric, value in stats.items():
+        if isinstance(value, dict):
+            for key, count in value.items():
+                yield {"metric": metric, "key": key, "value": count}
+        else:
+            yield {"metric": metric, "key": "", "value": value}
+
+def write_export(kind, fmt):
+    """Stream rows into an anonymous temp file and return it rewound"""
+    columns, rows = EXPORT_KINDS[kind]
+    raw = tempfile.TemporaryFile()  # Deleted when discord.File closes it
+    out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows():
+            writer.writerow(row)
+    else:
+        for row in rows():
+            out.write(json.dumps({column: row.get(column) for column in columns}) + "\n")
+    out.flush()
+    out.detach()
+    raw.seek(0)
+    return raw
+
+@command("export", "Export history or statistics as a file", permission="admin", defer=True)
+async def cmd_export(client, author, channel, args):
+    kind = args[0].lower() if args else "commands"
+    fmt = args[1].lower() if len(args) > 1 else "csv"
+    if kind not in EXPORT_KINDS or fmt not in ("csv", "ndjson"):
+        return "Usage: !export [commands/advances/stats] [csv/ndjson]"
+    
+    export_file = write_export(kind, fmt)
+    filename = f"{kind}_{now_est().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return {
+        "content": f"Export of {kind} ({fmt.upper()})",
+        "file": discord.File(export_file, filename=filename),
+    }
+
+@command("config", "View or change bot settings", permission="admin")
+async def cmd_config(client, author, channel, args):
+    action = args[0].lower() if args else "get"
+    usage = "Usage: !config [get [key]] | !config set <key> <value> | !config reload"
+    
+    if action == "set":
+        if len(args) != 3:
+            return usage
+        try:
+            update_settings({args[1]: args[2]}, f"!config by {author.id}")
+        except ValueError as e:
+            return f"Invalid setting: {e}"
+        return f"{args[1]} set to {settings()[args[1]]} (version {settings_snapshot['version']})"
+    
+    if action == "reload":
+        if not CONFIG_FILE:
+            return "No config file is configured (set CONFIG_FILE)."
+        changed = check_config_file(force=True)
+        return f"Config file {'reloaded' if changed else 'unchanged'} (version {settings_snapshot['version']})"
+    
+    if action != "get" or len(args) > 2:
+        return usage
+    
+    current = settings()
+    if len(args) == 2:
+        if args[1] not in current:
+            return f"Unknown setting '{args[1]}'. Known: {', '.join(SETTINGS_SCHEMA)}"
+        return f"{args[1]} = {current[args[1]]}"
+    
+    response = f"Settings (version {settings_snapshot['version']})\n--------------------------------\n"
+    for key, value in current.items():
+        response += f"{key}: {value}\n"
+    response += f"Config file: {CONFIG_FILE or 'none'}"
+    return response
+
+@command("ping", "Check bot latency", local=True)
+async def cmd_ping(client, author, channel, args):
+    latency = round(client.latency * 1000, 2)
+    return f"Pong! Latency: {latency}ms"
+
+@command("help", "Show help", local=True)
+async def cmd_help(client, author, channel, args):
+    return (
+        "Government Date Bot - Help\n"
+        "--------------------------------\n"
+        "Date Commands:\n"
+        "!date - Show current date information\n"
+        "!status - Show bot status\n"
+        "!ping - Check bot latency\n"
+        "\n"
+        "GM Commands:\n"
+        "!advance [months] - Manually advance date\n"
+        "!force - Force auto-advance check\n"
+        "!setdate <Month> <Year> - Set custom date\n"
+        "!send - Post the advancement notice\n"
+        "!clock [here/off] - Pin a live calendar clock\n"
+        "\n"
+        "Admin Commands:\n"
+        "!notifications [on/off] - Toggle notifications\n"
+        "!timeformat [12hr/24hr] - Change time format\n"
+        "!save - Manually save state\n"
+        "!debug [on/off] - Toggle debug mode\n"
+        "!config [get/set/reload] - View or change settings\n"
+        "!history [commands/advances/usage] - View history and its footprint\n"
+        "!channel [refresh] - Show notification channel status\n"
+        "!roles [add/remove] [admin/gm] [role] - Configure permission roles\n"
+        "!batch [dry] <operations> - Apply setdate/advance/rate in one go\n"
+        "!replay [fix] [<Month> <Year>] - Check date against history\n"
+        "!stats - Usage and advancement statistics (GM)\n"
+        "!export [commands/advances/stats] [csv/ndjson] - Download history\n"
+        "\n"
+        "Every command is also available as a /slash command.\n"
+        "\n"
+        "Settings:\n"
+        "• Auto-advance: 4 months per real day at midnight EST\n"
+        "• Max advance per run: 12 months\n"
+        "• Date progresses in real-time through each month\n"
+        "\n"
+        f"Admin: <@{ADMIN_USER_ID}>"
+    )
+
+# ==================== SLASH COMMANDS ====================
+
+MONTH_CHOICES = [
+    app_commands.Choice(name=m, value=m)
+    for m in ["January", "February", "March", "April", "May", "June", "July",
+              "August", "September", "October", "November", "December"]
+]
+
+async def run_slash_command(interaction, name, args, text=None):
+    """
+    Run a shared command handler for an application command interaction
+    text is a free-form option, split into further args once its length
+    has been checked
+    """
+    entry = COMMANDS[name]
+    client = interaction.client
+    if client.draining:
+        await interaction.response.send_message(DRAINING, ephemeral=True)
+        return
+    
+    # Reject oversized input before joining or splitting it
+    max_length = settings()["max_command_length"]
+    if sum(len(arg) + 1 for arg in args) + len(text or "") > max_length:
+        client.record_message(interaction.user.id, f"/{name}")
+        await interaction.response.send_message(TOO_LONG.format(limit=max_length), ephemeral=True)
+        return
+    
+    if text:
+        args = args + text.split()
+    client.record_message(interaction.user.id, " ".join([f"/{name}"] + args))
+    
+    if not is_authorized(interaction.user, entry):
+        await interaction.response.send_message(NOT_AUTHORIZED, ephemeral=True)
+        return
+    
+    task = asyncio.current_task()
+    client.in_flight.add(task)
+    try:
+        if entry["defer"]:
+            await interaction.response.defer(thinking=True)
+            response = await client.run_command(name, interaction.user, interaction.channel, args)
+            await interaction.followup.send(**reply_kwargs(response))
+        else:
+            response = await client.run_command(name, interaction.user, interaction.channel, args)
+            await interaction.response.send_message(**reply_kwargs(response))
+    except Exception:
+        # Always answer, or Discord shows "The application did not respond"
+        command_log.exception("Slash command failed", extra={"fields": {"command": name}})
+        if interaction.response.is_done():
+            await interaction.followup.send(COMMAND_FAILED, ephemeral=True)
+        else:
+            await interaction.response.send_message(COMMAND_FAILED, ephemeral=True)
+    finally:
+        client.in_flight.discard(task)
+
+def register_slash_commands(tree):
+    """Expose the shared command handlers as application commands"""
+    
+    def simple(name):
+        # Commands without arguments
+        async def callback(interaction: discord.Interaction):
+            await run_slash_command(interaction, name, [])
+        tree.command(name=name, description=COMMANDS[name]["description"])(callback)
+    
+    def toggle(name, choices):
+        # Commands taking an optional on/off style setting
+        @app_commands.choices(setting=[app_commands.Choice(name=c, value=c) for c in choices])
+        async def callback(interaction: discord.Interaction, setting: Optional[str] = None):
+            await run_slash_command(interaction, name, [setting] if setting else [])
+        tree.command(name=name, description=COMMANDS[name]["description"])(callback)
+    
+    for name in ["date", "status", "ping", "help", "force", "send", "save", "stats"]:
+        simple(name)
+    toggle("notifications", ["on", "off"])
+    toggle("debug", ["on", "off"])
+    toggle("timeformat", ["12hr", "24hr"])
+    toggle("channel", ["refresh"])
+    toggle("clock", ["here", "off"])
+    
+    @tree.command(name="advance", description=COMMANDS["advance"]["description"])
+    @app_commands.describe(months="Months to advance (defaults to the daily rate)")
+    async def advance(interaction: discord.Interaction, months: Optional[int] = None):
+        await run_slash_command(interaction, "advance", [str(months)] if months is not None else [])
+    
+    @tree.command(name="setdate", description=COMMANDS["setdate"]["description"])
+    @app_commands.choices(month=MONTH_CHOICES)
+    async def setdate(interaction: discord.Interaction, month: str, year: int):
+        await run_slash_command(interaction, "setdate", [month, str(year)])
+    
+    @tree.command(name="roles", description=COMMANDS["roles"]["description"])
+    @app_commands.choices(
+        action=[app_commands.Choice(name=a, value=a) for a in ["add", "remove"]],
+        level=[app_commands.Choice(name=l, value=l) for l in PERMISSION_LEVELS],
+    )
+    async def roles(interaction: discord.Interaction, action: Optional[str] = None,
+                    level: Optional[str] = None, role: Optional[discord.Role] = None):
+        args = [action, level, str(role.id)] if action and level and role else []
+        if action and not args:
+            args = [action]  # Incomplete: show usage
+        await run_slash_command(interaction, "roles", args)
+    
+    @tree.command(name="batch", description=COMMANDS["batch"]["description"])
+    @app_commands.describe(operations="e.g. setdate May 2030; advance 8; rate 3", dry_run="Preview without applying")
+    async def batch(interaction: discord.Interaction, operations: str, dry_run: bool = False):
+        await run_slash_command(interaction, "batch", ["dry"] if dry_run else [], text=operations)
+    
+    @tree.command(name="replay", description=COMMANDS["replay"]["description"])
+    @app_commands.describe(fix="Rebuild the current date from the history", base="Base date, e.g. May 2030")
+    async def replay(interaction: discord.Interaction, fix: bool = False, base: Optional[str] = None):
+        await run_slash_command(interaction, "replay", (["fix"] if fix else []) + (base.split() if base else []))
+    
+    @tree.command(name="config", description=COMMANDS["config"]["description"])
+    @app_commands.choices(
+        action=[app_commands.Choice(name=a, value=a) for a in ["get", "set", "reload"]],
+        key=[app_commands.Choice(name=k, value=k) for k in SETTINGS_SCHEMA],
+    )
+    async def config(interaction: discord.Interaction, action: str = "get",
+                     key: Optional[str] = None, value: Optional[str] = None):
+        await run_slash_command(interaction, "config", [a for a in (action, key, value) if a])
+    
+    @tree.command(name="export", description=COMMANDS["export"]["description"])
+    @app_commands.choices(
+        kind=[app_commands.Choice(name=k, value=k) for k in EXPORT_KINDS],
+        fmt=[app_commands.Choice(name=f, value=f) for f in ["csv", "ndjson"]],
+    )
+    async def export(interaction: discord.Interaction, kind: str = "commands", fmt: str = "csv"):
+        await run_slash_command(interaction, "export", [kind, fmt])
+    
+    @tree.command(name="history", description=COMMANDS["history"]["description"])
+    @app_commands.choices(kind=[
+        app_commands.Choice(name="commands", value="commands"),
+        app_commands.Choice(name="advances", value="advances"),
+        app_commands.Choice(name="usage", value="usage"),
+    ])
+    async def history(interaction: discord.Interaction, kind: Optional[str] = None):
+        await run_slash_command(interaction, "history", [kind] if kind else [])
+
+# ==================== DISCORD BOT ====================
+
+# Seconds before retrying a failed startup/midnight catch-up
+CATCHUP_RETRY = int(os.getenv("CATCHUP_RETRY", 60))
+
+# "prefix" parses !commands from chat, "slash" uses application commands only
+# (no message_content intent, no message events), "both" enables the two
+COMMAND_MODE = os.getenv("COMMAND_MODE", "both")
+# "auto" syncs the slash commands only when their definitions changed since
+# the last sync (short-lived hosts restart many times a day and syncing is
+# rate limited), "1" syncs on every start, "0" never
+SYNC_COMMANDS = os.getenv("SYNC_COMMANDS", "auto")
+
+# Gateway shards: a number, or "auto" for Discord's recommended count.
+# Unset means 1, or one per worker process when SHARD_WORKERS > 0.
+# With SHARD_WORKERS > 0 the shards are split across worker processes
+# and this process becomes the coordinator that owns the calendar state.
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", 0))
+
+intents = discord.Intents.default()
+intents.members = True  # REMEMBER: You must enable "Server Members Intent" in Discord Developer Portal
+if COMMAND_MODE == "slash":
+    # Skip ordinary chat entirely: no message events reach the bot
+    intents.message_content = False
+    intents.messages = False
+else:
+    intents.message_content = True
+
+class CatchupMixin:
+    """Once-per-day catch-up, run by whichever process owns the calendar"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catchup_task = None
+        self.catchup = {
+            "state": "pending",  # pending, running, done or failed
+            "day": None,  # Real (EST) day of the last completed run
+            "started": None,
+            "finished": None,
+            "summary": None,
+        }
+        
+    async def catchup_loop(self):
+        """Check for missed advancements once per real day, then wait for midnight"""
+        while not self.is_closed():
+            await self.wait_until_ready()
+            today = now_est().date()
+            if self.catchup["day"] != today:
+                # The guard is persisted, since short-lived hosts restart
+                # many times a day and each new process would check again
+                last_check = datetime.fromisoformat(state["last_check_timestamp"]).astimezone(EST)
+                if last_check.date() == today:
+                    advance_log.info("Already checked today, skipping catch-up")
+                    self.catchup.update(state="done", day=today, finished=last_check,
+                                        summary="already checked today")
+                else:
+                    await self.run_catchup()
             
-            if advanced:
-                response = (
-                    f"Force Advance Completed\n"
-                    f"--------------------------------\n"
-                    f"Days missed: {days_missed}\n"
-                    f"Months advanced: {months_advanced}\n"
-                    f"New date: {new_date.strftime('%B %Y')}\n"
-                    f"Time: {datetime.now(EST).strftime('%I:%M:%S %p EST')}"
-                )
+            if self.catchup["state"] == "failed":
+                delay = CATCHUP_RETRY
             else:
-                last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
-                response = (
-                    f"No Advancement Needed\n"
-                    f"--------------------------------\n"
-                    f"Last advance: {last_adv.strftime('%Y-%m-%d')}\n"
-                    f"Today: {datetime.now(EST).date().strftime('%Y-%m-%d')}\n"
-                    f"Current time: {datetime.now(EST).strftime('%I:%M:%S %p EST')}"
-                )
-            
-            await message.channel.send(response)  # Always post response here
-                    
-        # !setdate <Month> <Year> - Set custom date (admin)
-        elif message.content.startswith("!setdate"):
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            parts = message.content.split()
-            if len(parts) != 3:
-                await message.channel.send(
-                    "Usage: !setdate <Month> <Year>\n"
-                    "Example: !setdate May 2026\n"
-                    "Example: !setdate December 2027"
-                )
-                return
-            
+                # Wake just after the next midnight EST
+                today = now_est().date()
+                next_midnight = datetime.combine(today + timedelta(days=1), dt_time(0, 0, tzinfo=EST))
+                hours, minutes, seconds = calculate_time_until(next_midnight)
+                delay = hours * 3600 + minutes * 60 + seconds + 5
+            await asyncio.sleep(delay)
+        
+    async def run_catchup(self):
+        """Resolve the notification channel and apply any missed advancement"""
+        self.catchup.update(state="running", day=now_est().date(), started=now_est(), finished=None)
+        advance_log.info("Checking for missed advancements")
+        try:
+            target = await self.notification_target()
+            advanced, days_missed, months_advanced, new_date = await check_and_advance_date(self, target)
+        except Exception:
+            advance_log.exception("Catch-up failed, will retry")
+            self.catchup.update(state="failed", day=None, finished=now_est(), summary="failed, retrying")
+            return
+        
+        if advanced:
+            advance_log.info("Auto-advance completed", extra={"fields": {"months": months_advanced}})
+            summary = f"advanced {months_advanced} months ({days_missed} day(s) missed)"
+        else:
+            advance_log.info("No advancement needed")
+            summary = "no advancement needed"
+        self.catchup.update(state="done", finished=now_est(), summary=summary)
+        
+    def catchup_status(self):
+        """One-line description of the latest catch-up run"""
+        if self.catchup["state"] == "pending":
+            return "pending"
+        if self.catchup["state"] == "running":
+            return f"running since {self.catchup['started'].strftime('%I:%M:%S %p EST')}"
+        return f"{self.catchup['state']} at {self.catchup['finished'].strftime('%Y-%m-%d %I:%M %p EST')}, {self.catchup['summary']}"
+
+class GovernmentBot(CatchupMixin, discord.AutoShardedClient):
+    def __init__(self, shard_count=1, shard_ids=None, link=None):
+        super().__init__(intents=intents, shard_count=shard_count, shard_ids=shard_ids)
+        self.link = link  # CoordinatorLink when running as a shard worker
+        self.notification_channel = None
+        self.start_time = now_est()
+        self.tree = app_commands.CommandTree(self)
+        self.outbox = asyncio.Queue()  # (channel, content) pairs for the sender task
+        self.in_flight = set()  # Command tasks still running
+        self.draining = False
+        self.drain_task = None
+        self.clock_task = None
+        self.clock_dirty = asyncio.Event()
+        self.last_presence = None  # Last rendered texts, to skip no-op edits
+        self.last_clock_text = None
+        
+    async def setup_hook(self):
+        self.loop.create_task(self.outbox_worker())
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, self.request_drain, "SIGTERM")
+        except (NotImplementedError, RuntimeError):
+            pass  # Signal handlers are unavailable on Windows and off the main thread
+        
+        if COMMAND_MODE in ("slash", "both"):
+            register_slash_commands(self.tree)
+            # Commands are global, so with shard workers only worker 0 syncs
+            if self.link is None or self.link.index == 0:
+                await self.sync_commands()
+        
+    async def sync_commands(self):
+        """Push the slash command definitions to Discord when needed"""
+        payload = json.dumps([command.to_dict(self.tree) for command in self.tree.get_commands()], sort_keys=True)
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        if SYNC_COMMANDS == "0" or (SYNC_COMMANDS == "auto" and state.get("slash_sync") == digest):
+            log.info("Slash command sync skipped", extra={"fields": {"mode": SYNC_COMMANDS}})
+            return
+        
+        synced = await self.tree.sync()
+        state["slash_sync"] = digest
+        save_state()
+        log.info("Slash commands synced", extra={"fields": {"count": len(synced)}})
+        
+    async def on_ready(self):
+        # Get current state
+        current = datetime.fromisoformat(state.get("current_date", now_est().isoformat()))
+        last_adv = datetime.fromisoformat(state.get("last_advance_date", now_est().date().isoformat())).date()
+        
+        log.info("Bot connected", extra={"fields": {
+            "user": str(self.user),
+            "bot_id": self.user.id,
+            "start_time": self.start_time.isoformat(),
+            "servers": len(self.guilds),
+            "current_date": current.strftime('%B %Y'),
+            "last_advance": last_adv.strftime('%Y-%m-%d'),
+            "notifications": state.get('notifications_enabled', True),
+            "command_mode": COMMAND_MODE,
+            "shards": self.shard_count,
+            "shard_ids": self.shard_ids,
+        }})
+        
+        # Permission index from the fresh member cache
+        rebuild_permission_index(self)
+        
+        # The gateway cache was rebuilt, so resolve the channel again when needed
+        invalidate_channel_cache("ready")
+        
+        # Background loops start once; reconnects don't repeat their work.
+        # Catch-up runs off the ready path so commands are served right away.
+        # Shard workers leave advancement to the coordinator.
+        if self.clock_task is None:
+            self.clock_task = self.loop.create_task(self.clock_loop())
+        if self.catchup_task is None and self.link is None:
+            self.catchup_task = self.loop.create_task(self.catchup_loop())
+        self.request_clock_refresh()
+        self.report_guilds()
+        
+    async def notification_target(self):
+        self.notification_channel = await get_notification_channel(self)
+        return self.notification_channel
+        
+    async def run_command(self, name, author, channel, args):
+        """Run a command here, or on the coordinator when it touches calendar state"""
+        entry = COMMANDS.get(name)
+        if self.link is None or entry is None or entry["local"] or not is_authorized(author, entry):
+            return await dispatch_command(self, name, author, channel, args)
+        return await self.link.run_command(name, author, channel, args)
+        
+    def record_message(self, user_id, content):
+        """Add a message to the command history, wherever the state lives"""
+        if self.link is None:
+            log_command(user_id, content)
+        else:
+            self.link.record_message(user_id, clip_content(content))
+        
+    def report_guilds(self):
+        if self.link is not None and self.is_ready():
+            self.link.report_guilds(self)
+        
+    def request_clock_refresh(self):
+        """Ask the clock loop to re-render soon; repeated requests coalesce"""
+        self.clock_dirty.set()
+        
+    async def clock_loop(self):
+        """Keep the presence and pinned clock message current"""
+        while not self.is_closed():
             try:
-                month_name = parts[1]
-                year = int(parts[2])
-                
-                # Parse month
-                month_num = datetime.strptime(month_name, "%B").month
-                new_date = datetime(year, month_num, 1, tzinfo=EST)
-                
-                # Get old date for logging
-                old_date = datetime.fromisoformat(state["current_date"])
-                
-                # Update state
-                state["current_date"] = new_date.isoformat()
-                state["last_advance_date"] = datetime.now(EST).date().isoformat()
-                save_state()
-                
-                # Update bot status
-                await self.change_presence(
-                    activity=discord.Activity(
-                        type=discord.ActivityType.watching,
-                        name=f"{new_date.strftime('%B %Y')} | !help"
-                    )
-                )
-                
-                response = (
-                    f"Date Successfully Set\n"
-                    f"--------------------------------\n"
-                    f"New date: {new_date.strftime('%B %Y')}\n"
-                    f"Previous date: {old_date.strftime('%B %Y')}\n"
-                    f"Last advance reset to: {datetime.now(EST).date().strftime('%Y-%m-%d')}\n"
-                    f"By: {message.author.mention}"
-                )
-                await message.channel.send(response)
-                
-            except ValueError:
-                await message.channel.send(
-                    "Invalid date format.\n"
-                    "Valid months: January, February, March, April, May, June, July, "
-                    "August, September, October, November, December\n"
-                    "Example: !setdate May 2026"
-                )
-                
-        # !status - Bot status
-        elif message.content == "!status":
-            current = datetime.fromisoformat(state["current_date"])
-            last_adv = datetime.fromisoformat(state["last_advance_date"]).date()
-            today = datetime.now(EST).date()
-            days_since = (today - last_adv).days
+                await asyncio.wait_for(self.clock_dirty.wait(), timeout=CLOCK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.clock_dirty.clear()
             
-            # Calculate next midnight
-            next_midnight = datetime.combine(today + timedelta(days=1), dt_time(0, 0, tzinfo=EST))
-            hours, minutes, seconds = calculate_time_until(next_midnight)
-            
-            # Calculate uptime
-            uptime = datetime.now(EST) - self.start_time
-            uptime_str = f"{uptime.days}d {uptime.seconds//3600}h {(uptime.seconds%3600)//60}m"
+            await self.wait_until_ready()
+            try:
+                await self.refresh_clock()
+            except Exception:
+                log.exception("Failed to refresh calendar clock")
             
-            response = (
-                f"Bot Status\n"
-                f"--------------------------------\n"
-                f"Bot: {self.user}\n"
-                f"ID: {self.user.id}\n"
-                f"Uptime: {uptime_str}\n"
-                f"Servers: {len(self.guilds)}\n"
-                f"\n"
-                f"Date Status\n"
-                f"--------------------------------\n"
-                f"Current date: {current.strftime('%B %Y')}\n"
-                f"Last advance: {last_adv.strftime('%Y-%m-%d')}\n"
-                f"Days since advance: {days_since}\n"
-                f"Next auto-advance: {hours}h {minutes}m {seconds}s\n"
-                f"\n"
-                f"Settings\n"
-                f"--------------------------------\n"
-                f"Notifications: {'ON' if state.get('notifications_enabled', True) else 'OFF'}\n"
-                f"Time format: {state.get('time_format', '12hr')}\n"
-                f"Rate: {state.get('settings', {}).get('months_per_day', 4)} months/day\n"
-                f"Max/run: {state.get('settings', {}).get('max_advance_per_run', 12)} months\n"
-                f"Auto-save: {'ON' if state.get('settings', {}).get('auto_save', True) else 'OFF'}\n"
-                f"\n"
-                f"Admin: <@{ADMIN_USER_ID}>"
+            # Requests arriving during this pause are folded into the next pass
+            await asyncio.sleep(CLOCK_MIN_EDIT_INTERVAL)
+        
+    async def refresh_clock(self):
+        """Render presence and clock, editing only what changed"""
+        now = now_est()
+        
+        presence = render_presence(now)
+        if presence != self.last_presence:
+            await self.change_presence(
+                activity=discord.Activity(type=discord.ActivityType.watching, name=presence)
             )
-            await message.channel.send(response)
-            
-        # !notifications [on/off] - Toggle notifications (admin)
-        elif message.content.startswith("!notifications"):
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            parts = message.content.split()
-            if len(parts) > 1:
-                setting = parts[1].lower()
-                if setting in ["on", "enable", "yes", "true"]:
-                    state["notifications_enabled"] = True
-                    response = "Notifications ENABLED"
-                elif setting in ["off", "disable", "no", "false"]:
-                    state["notifications_enabled"] = False
-                    response = "Notifications DISABLED"
-                else:
-                    response = f"Invalid setting. Use !notifications on or !notifications off"
-            else:
-                # Toggle
-                current = state.get("notifications_enabled", True)
-                state["notifications_enabled"] = not current
-                response = f"Notifications {'ENABLED' if not current else 'DISABLED'}"
-            
-            save_state()
-            await message.channel.send(response)
-            
-        # !timeformat [12hr/24hr] - Change time format
-        elif message.content.startswith("!timeformat"):
-            parts = message.content.split()
-            if len(parts) > 1:
-                new_format = parts[1].lower()
-                if new_format in ["12hr", "12", "12h"]:
-                    state["time_format"] = "12hr"
-                    response = "Time format set to 12-hour (AM/PM)"
-                elif new_format in ["24hr", "24", "24h"]:
-                    state["time_format"] = "24hr"
-                    response = "Time format set to 24-hour"
-                else:
-                    response = "Invalid format. Use 12hr or 24hr"
-            else:
-                # Toggle
-                current = state.get("time_format", "12hr")
-                state["time_format"] = "24hr" if current == "12hr" else "12hr"
-                response = f"Time format changed to {state['time_format']}"
-            
+            self.last_presence = presence
+        
+        clock = state.get("clock") or {}
+        if not clock.get("message_id"):
+            return
+        
+        text = render_clock(now)
+        if text == self.last_clock_text:
+            return
+        
+        channel = self.get_channel(clock["channel_id"])
+        if channel is None:
+            if self.link is None:
+                log.warning("Clock channel not available", extra={"fields": {"channel_id": clock["channel_id"]}})
+            return
+        try:
+            await channel.get_partial_message(clock["message_id"]).edit(content=text)
+            self.last_clock_text = text
+        except discord.NotFound:
+            log.warning("Clock message was deleted, disabling clock")
+            state["clock"] = {}
             save_state()
-            await message.channel.send(response)
-            
-        # !save - Manual save
-        elif message.content == "!save":
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            if save_state():
-                last_save = datetime.fromtimestamp(last_save_time).strftime('%Y-%m-%d %H:%M:%S')
-                await message.channel.send(f"State saved successfully at {last_save}")
-            else:
-                await message.channel.send("Failed to save state")
-                
-        # !debug [on/off] - Toggle debug mode (admin)
-        elif message.content.startswith("!debug"):
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            if "settings" not in state:
-                state["settings"] = {}
-            
-            parts = message.content.split()
-            if len(parts) > 1:
-                setting = parts[1].lower()
-                if setting in ["on", "enable", "yes", "true"]:
-                    state["settings"]["debug_mode"] = True
-                    response = "Debug mode ENABLED"
-                elif setting in ["off", "disable", "no", "false"]:
-                    state["settings"]["debug_mode"] = False
-                    response = "Debug mode DISABLED"
-                else:
-                    current = state["settings"].get("debug_mode", False)
-                    response = f"Debug mode is currently {'ENABLED' if current else 'DISABLED'}"
-            else:
-                # Toggle
-                current = state["settings"].get("debug_mode", False)
-                state["settings"]["debug_mode"] = not current
-                response = f"Debug mode {'ENABLED' if not current else 'DISABLED'}"
-            
+        
+    def queue_send(self, channel, content):
+        """Queue a message for the background sender"""
+        self.outbox.put_nowait((channel, content))
+        
+    async def outbox_worker(self):
+        """Send queued messages one at a time"""
+        while True:
+            channel, content = await self.outbox.get()
+            try:
+                await channel.send(content)
+                log.info("Queued message sent", extra={"fields": {"channel": str(channel)}})
+            except discord.Forbidden:
+                log.warning("No permission to send queued message", extra={"fields": {"channel": str(channel)}})
+            except Exception:
+                log.exception("Failed to send queued message")
+            finally:
+                self.outbox.task_done()
+        
+    def request_drain(self, reason):
+        """Start draining from a signal handler or timer"""
+        if self.drain_task is None:
+            self.drain_task = self.loop.create_task(self.drain(reason))
+        
+    async def drain(self, reason):
+        """Stop taking commands, finish in-flight work and queued sends, then close"""
+        self.draining = True
+        log.info("Draining before exit", extra={"fields": {
+            "reason": reason,
+            "in_flight": len(self.in_flight),
+            "queued": self.outbox.qsize(),
+        }})
+        
+        pending = self.in_flight - {asyncio.current_task()}
+        if pending:
+            await asyncio.wait(pending, timeout=DRAIN_TIMEOUT)
+        try:
+            await asyncio.wait_for(self.outbox.join(), timeout=DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning("Outbox not drained before timeout", extra={"fields": {"queued": self.outbox.qsize()}})
+        
+        await self.close()
+        
+    # Notification channel cache invalidation
+    
+    async def on_guild_channel_update(self, before, after):
+        if after.id == CHANNEL_ID:
+            invalidate_channel_cache("channel update")
+        
+    async def on_guild_channel_delete(self, channel):
+        if channel.id == CHANNEL_ID:
+            invalidate_channel_cache("channel delete")
+        
+    async def on_guild_join(self, guild):
+        self.report_guilds()
+        if self.affects_notification_channel(guild):
+            invalidate_channel_cache("guild joined")
+        
+    async def on_guild_role_update(self, before, after):
+        if self.affects_notification_channel(after.guild):
+            invalidate_channel_cache("role update")
+        
+    async def on_guild_role_delete(self, role):
+        if self.affects_notification_channel(role.guild):
+            invalidate_channel_cache("role delete")
+        
+        # Drop the role from the permission config and index
+        config = state.get("permissions", {}).get(str(role.guild.id))
+        if config and any(role.id in config.get(level, []) for level in PERMISSION_LEVELS):
+            for level in PERMISSION_LEVELS:
+                if role.id in config.get(level, []):
+                    config[level].remove(role.id)
             save_state()
-            await message.channel.send(response)
-            
-        # !history [commands/advances] - View history (admin)
-        elif message.content.startswith("!history"):
-            if message.author.id != ADMIN_USER_ID:
-                await message.channel.send("You are not authorized to use this command.")
-                return
-            
-            parts = message.content.split()
-            history_type = "commands" if len(parts) < 2 else parts[1].lower()
-            
-            if history_type in ["cmd", "commands", "command"]:
-                history = state.get("command_history", [])
-                if not history:
-                    await message.channel.send("No command history recorded.")
-                    return
-                
-                # Show last 10 commands
-                recent = history[-10:]
-                response = "Recent Commands (Last 10)\n--------------------------------\n"
-                for entry in recent:
-                    dt = datetime.fromisoformat(entry["timestamp"])
-                    response += f"• <t:{int(dt.timestamp())}:R> - <@{entry['user']}>: {entry['command']}\n"
-                
-            elif history_type in ["adv", "advance", "advances", "advancement"]:
-                history = state.get("advancement_history", [])
-                if not history:
-                    await message.channel.send("No advancement history recorded.")
-                    return
-                
-                # Show last 5 advancements
-                recent = history[-5:]
-                response = "Recent Advancements (Last 5)\n--------------------------------\n"
-                for entry in recent:
-                    dt = datetime.fromisoformat(entry["timestamp"])
-                    old_date = datetime.fromisoformat(entry["old_date"])
-                    new_date = datetime.fromisoformat(entry["new_date"])
-                    response += (
-                        f"• <t:{int(dt.timestamp())}:R>\n"
-                        f"  {old_date.strftime('%B %Y')} -> {new_date.strftime('%B %Y')}\n"
-                        f"  {entry['months_advanced']} months ({entry['days_missed']} days)\n"
-                        f"  Type: {entry['type']}\n"
-                    )
+        if permission_index["roles"].pop(role.id, None):
+            reindex_guild(role.guild)
+        
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            index_member(after)
+            if after.id == self.user.id:
+                invalidate_channel_cache("bot roles changed")
+        
+    async def on_member_join(self, member):
+        index_member(member)
+        
+    async def on_member_remove(self, member):
+        set_member_permissions(member.guild.id, member.id, set())
+        
+    async def on_guild_remove(self, guild):
+        self.report_guilds()
+        if self.affects_notification_channel(guild):
+            invalidate_channel_cache("guild removed")
+        
+        for user_id in list(permission_index["members"]):
+            set_member_permissions(guild.id, user_id, set())
+        
+    def affects_notification_channel(self, guild):
+        """Whether a change in this guild could alter the notification channel"""
+        channel = channel_cache["channel"] or self.get_channel(CHANNEL_ID)
+        if channel is None:
+            # Unknown location: any permission change might make it usable
+            return True
+        return getattr(channel, "guild", None) == guild
+        
+    async def on_message(self, message):
+        # Ignore bot messages
+        if message.author.bot or COMMAND_MODE == "slash" or self.draining:
+            return
+        
+        # Log command (truncated, see history_content_limit)
+        content = message.content
+        self.record_message(message.author.id, content)
+        
+        # Chat echo (sampled, see LOG_SAMPLE_RATES)
+        chat_log.info("Message", extra={"fields": {
+            "author": str(message.author),
+            "channel": str(message.channel),
+            "content": clip_content(content),
+        }})
+        
+        if not content.startswith("!"):
+            return
+        
+        # ==================== COMMAND HANDLING ====================
+        
+        # Reject oversized input before splitting it
+        max_length = settings()["max_command_length"]
+        if len(content) > max_length:
+            await message.channel.send(TOO_LONG.format(limit=max_length))
+            return
+        
+        parts = content.split()
+        name, args = parts[0][1:], parts[1:]
+        entry = COMMANDS.get(name)
+        
+        task = asyncio.current_task()
+        self.in_flight.add(task)
+        try:
+            if entry and entry["defer"] and is_authorized(message.author, entry):
+                # Show typing while slow commands run
+                async with message.channel.typing():
+                    response = await self.run_command(name, message.author, message.channel, args)
             else:
-                response = "Invalid history type. Use !history commands or !history advances"
-            
-            await message.channel.send(response)
+                response = await self.run_command(name, message.author, message.channel, args)
             
-        # !ping - Check latency
-        elif message.content == "!ping":
-            latency = round(self.latency * 1000, 2)
-            await message.channel.send(f"Pong! Latency: {latency}ms")
-            
-        # !help - Show help
-        elif message.content == "!help":
-            response = (
-                "Government Date Bot - Help\n"
-                "--------------------------------\n"
-                "Date Commands:\n"
-                "!date - Show current date information\n"
-                "!status - Show bot status\n"
-                "!ping - Check bot latency\n"
-                "\n"
-                "Admin Commands:\n"
-                "!advance [months] - Manually advance date\n"
-                "!force - Force auto-advance check\n"
-                "!setdate <Month> <Year> - Set custom date\n"
-                "!notifications [on/off] - Toggle notifications\n"
-                "!timeformat [12hr/24hr] - Change time format\n"
-                "!save - Manually save state\n"
-                "!debug [on/off] - Toggle debug mode\n"
-                "!history [commands/advances] - View history\n"
-                "\n"
-                "Settings:\n"
-                "• Auto-advance: 4 months per real day at midnight EST\n"
-                "• Max advance per run: 12 months\n"
-                "• Date progresses in real-time through each month\n"
-                "\n"
-                f"Admin: <@{ADMIN_USER_ID}>"
-            )
-            await message.channel.send(response)
-            
-        # Unknown command
-        elif message.content.startswith("!"):
-            await message.channel.send(
-                f"Unknown command. Type !help for available commands.\n"
-                f"Did you mean !date or !status?"
-            )
+            await message.channel.send(**reply_kwargs(response))
+        finally:
+            self.in_flight.discard(task)
 
-# ==================== MAIN EXECUTION ====================
 
-if __name__ == "__main__":
+# ==================== SHARD WORKERS ====================
+
+# Workers and the coordinator exchange newline-delimited JSON over a
+# localhost socket. The coordinator alone runs advancement and writes the
+# state file; workers keep a read-only replica for presence, permissions
+# and the commands that need their gateway cache.
+IPC_HOST = "127.0.0.1"
+IPC_LINE_LIMIT = 16 * 1024 * 1024  # Largest message, e.g. an export file
+WORKER_RESTART_DELAY = 10
+WORKER_READY_TIMEOUT = int(os.getenv("WORKER_READY_TIMEOUT", 120))  # Seconds catch-up waits for every worker
+
+# State keys copied to workers, and the ones workers may change
+REPLICATED_KEYS = ("current_date", "last_advance_date", "time_format",
+                   "notifications_enabled", "clock", "permissions", "slash_sync")
+WORKER_KEYS = ("clock", "permissions", "slash_sync")
+
+class RemoteUser(NamedTuple):
+    """A Discord user as seen by the coordinator"""
+    id: int
+    name: str
+    
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+    
+    def __str__(self):
+        return self.name
+
+def encode_ipc(message):
+    return (json.dumps(message) + "\n").encode()
+
+def send_ipc(writer, message):
+    writer.write(encode_ipc(message))
+
+async def read_ipc(reader):
+    """Yield messages until the other side disconnects"""
+    while True:
+        try:
+            line = await reader.readline()
+        except (ConnectionError, ValueError):
+            return
+        if not line:
+            return
+        yield json.loads(line)
+
+def replica_message():
+    """The state and settings a worker needs, as one message"""
+    return {
+        "op": "state",
+        "state": {key: state[key] for key in REPLICATED_KEYS if key in state},
+        "settings": dict(settings()),
+    }
+
+def encode_reply(response):
+    """Turn a handler reply into JSON the worker can send on"""
+    kwargs = reply_kwargs(response)
+    data = {"content": kwargs.get("content")}
+    if "file" in kwargs:
+        file = kwargs["file"]
+        data["file"] = {"filename": file.filename, "data": base64.b64encode(file.fp.read()).decode()}
+        file.close()
+    if "allowed_mentions" in kwargs:
+        data["mentions"] = False
+    return data
+
+def decode_reply(data):
+    """Rebuild send() kwargs from an encoded reply"""
+    kwargs = {"content": data.get("content")}
+    if data.get("file"):
+        kwargs["file"] = discord.File(
+            io.BytesIO(base64.b64decode(data["file"]["data"])), filename=data["file"]["filename"]
+        )
+    if data.get("mentions") is False:
+        kwargs["allowed_mentions"] = discord.AllowedMentions.none()
+    return kwargs
+
+class CoordinatorLink:
+    """Worker side of the connection to the coordinator"""
+    def __init__(self, index):
+        self.index = index
+        self.bot = None
+        self.reader = None
+        self.writer = None
+        self.pending = {}  # request id -> future for the reply
+        self.next_id = 0
+        self.replica = {}  # Last state received, to find local changes
+        self.synced = asyncio.Event()
+        
+    async def connect(self, port, token):
+        self.reader, self.writer = await asyncio.open_connection(IPC_HOST, port, limit=IPC_LINE_LIMIT)
+        send_ipc(self.writer, {"op": "hello", "token": token, "worker": self.index})
+        asyncio.get_running_loop().create_task(self.receive())
+        await self.synced.wait()
+        
+    async def receive(self):
+        async for message in read_ipc(self.reader):
+            op = message["op"]
+            if op == "state":
+                self.apply_state(message)
+            elif op == "reply":
+                future = self.pending.pop(message["id"], None)
+                if future and not future.done():
+                    future.set_result(message["reply"])
+            elif op == "send":
+                # Only the worker holding the channel's guild has it cached
+                channel = self.bot.get_channel(message["channel_id"]) if self.bot else None
+                if channel is not None:
+                    self.bot.queue_send(channel, message["content"])
+            elif op == "drain" and self.bot:
+                self.bot.request_drain("coordinator")
+        
+        log.warning("Lost connection to coordinator", extra={"fields": {"worker": self.index}})
+        self.writer.close()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_result({"content": DRAINING})
+        self.pending.clear()
+        self.synced.set()
+        if self.bot:
+            self.bot.request_drain("coordinator lost")
+        
+    def apply_state(self, message):
+        permissions_changed = message["state"].get("permissions") != state.get("permissions")
+        self.replica = json.loads(json.dumps(message["state"]))
+        state.update(message["state"])
+        publish_settings(build_settings(message["settings"]), "coordinator")
+        
+        if self.bot and self.bot.is_ready():
+            if permissions_changed:
+                rebuild_permission_index(self.bot)
+            self.bot.request_clock_refresh()
+        self.synced.set()
+        
+    def send(self, message):
+        if self.writer is not None and not self.writer.is_closing():
+            send_ipc(self.writer, message)
+            return True
+        return False
+        
+    async def run_command(self, name, author, channel, args):
+        """Run a command on the coordinator and return the reply kwargs"""
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        sent = self.send({
+            "op": "command",
+            "id": self.next_id,
+            "name": name,
+            "args": args,
+            "author": {"id": author.id, "name": str(author)},
+            "channel_id": getattr(channel, "id", None),
+        })
+        if not sent:
+            self.pending.pop(self.next_id)
+            return DRAINING
+        return decode_reply(await future)
+        
+    def record_message(self, user_id, content):
+        self.send({"op": "log", "user": user_id, "content": content})
+        
+    def report_guilds(self, bot):
+        self.send({
+            "op": "guilds",
+            "worker": self.index,
+            "user": {"id": bot.user.id, "name": str(bot.user)},
+            "guilds": [guild.id for guild in bot.guilds],
+        })
+        
+    def push_changes(self):
+        """Send the worker-owned keys that differ from the last replica"""
+        changes = {
+            key: state.get(key) for key in WORKER_KEYS
+            if key != "permissions" and state.get(key) != self.replica.get(key)
+        }
+        # Guilds live on exactly one shard, so per-guild entries never conflict
+        guilds = {
+            guild_id: config for guild_id, config in state.get("permissions", {}).items()
+            if self.replica.get("permissions", {}).get(guild_id) != config
+        }
+        if guilds:
+            changes["permissions"] = guilds
+        if changes:
+            self.send({"op": "patch", "changes": changes})
+            self.replica.update(json.loads(json.dumps({key: state.get(key) for key in WORKER_KEYS})))
+        
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def run_worker(index, shard_ids, shard_count, port, token):
+    global coordinator_link
+    link = CoordinatorLink(index)
+    await link.connect(port, token)
+    if not state:
+        log.error("Coordinator closed before sending state", extra={"fields": {"worker": index}})
+        return
+    coordinator_link = link
+    
+    bot = GovernmentBot(shard_count=shard_count, shard_ids=shard_ids, link=link)
+    link.bot = bot
+    try:
+        await run_bot(bot)
+    finally:
+        await link.close()
+
+def worker_main(index, shard_ids, shard_count, port, token, profile_name):
+    """Entry point of a shard worker process"""
+    global CONFIG_FILE
+    CONFIG_FILE = None  # Settings arrive from the coordinator
+    profile.update(PROFILES[profile_name], name=profile_name)
+    # Workers log to the console only; the log file belongs to the coordinator
+    setup_logging(LOG_FORMAT if LOG_FORMAT is not None else profile["log_format"], "")
+    log.info("Shard worker starting", extra={"fields": {"worker": index, "shards": shard_ids, "of": shard_count}})
     try:
-        bot = GovernmentBot()
+        asyncio.run(run_worker(index, shard_ids, shard_count, port, token))
+    except discord.LoginFailure:
+        log.error("Invalid Discord token")
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        log.exception("Shard worker crashed")
+    finally:
+        stop_logging()
+
+class Coordinator(CatchupMixin):
+    """
+    Owns the calendar state for a set of shard worker processes
+    Runs advancement and state-changing commands for the workers, so the
+    state file keeps a single writer however many shards there are
+    """
+    def __init__(self, shard_count, workers, profile_name):
+        super().__init__()
+        self.shard_count = shard_count
+        self.workers = workers
+        self.profile_name = profile_name
+        self.token = secrets.token_hex(16)
+        self.server = None
+        self.processes = {}  # worker index -> Process
+        self.connections = {}  # worker index -> StreamWriter
+        self.worker_guilds = {}  # worker index -> guild ids
+        self.user = None
+        self.start_time = now_est()
+        self.in_flight = set()
+        self.draining = False
+        self.drain_task = None
+        self.supervisors = []
+        self.ready = asyncio.Event()  # Every worker has reported its guilds
+        self.closed = asyncio.Event()
+        self.last_replica = None
         
-        # Clean shutdown handler
-        import atexit
-        def shutdown():
-            print("\n" + "=" * 60)
-            print("Shutting down bot...")
-            stop_event.set()
-            if auto_save_thread:
-                auto_save_thread.join(timeout=5)
-            save_state()
-            print("Shutdown complete")
-            print("=" * 60)
+    # Client interface used by the catch-up and command handlers
+    
+    @property
+    def guilds(self):
+        return [guild_id for guilds in self.worker_guilds.values() for guild_id in guilds]
+        
+    def is_closed(self):
+        return self.closed.is_set()
         
+    async def wait_until_ready(self):
+        # A worker that never reports must not block the daily catch-up, so
+        # go ahead after a bounded wait. Notices for channels that no
+        # connected worker owns are then dropped.
+        try:
+            await asyncio.wait_for(self.ready.wait(), WORKER_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning("Not every shard worker is ready, continuing without them", extra={"fields": {
+                "ready": sorted(self.worker_guilds), "workers": self.workers}})
+            self.ready.set()
+        
+    async def notification_target(self):
+        # Workers resolve the channel from their cache when delivering
+        return discord.Object(id=CHANNEL_ID) if CHANNEL_ID else None
+        
+    def queue_send(self, channel, content):
+        self.broadcast({"op": "send", "channel_id": channel.id, "content": content})
+        
+    def request_clock_refresh(self):
+        # Workers refresh presence and the clock when a new replica arrives
+        self.broadcast_state()
+        
+    def broadcast(self, message):
+        data = encode_ipc(message)
+        for writer in self.connections.values():
+            if not writer.is_closing():
+                writer.write(data)
+        return data
+        
+    def broadcast_state(self):
+        """Send the replica to every worker, unless it is unchanged"""
+        message = replica_message()
+        if message != self.last_replica:
+            self.broadcast(message)
+            self.last_replica = message
+        
+    # Worker processes
+    
+    async def start(self):
+        if self.shard_count is None:
+            self.shard_count = await recommended_shard_count()
+        self.workers = min(self.workers, self.shard_count)
+        self.server = await asyncio.start_server(self.handle_worker, IPC_HOST, 0, limit=IPC_LINE_LIMIT)
+        port = self.server.sockets[0].getsockname()[1]
+        log.info("Coordinator listening", extra={"fields": {
+            "port": port,
+            "workers": self.workers,
+            "shards": self.shard_count,
+        }})
+        
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, self.request_drain, "SIGTERM")
+        except (NotImplementedError, RuntimeError):
+            pass
+        self.supervisors = [loop.create_task(self.supervise(index, port)) for index in range(self.workers)]
+        self.catchup_task = loop.create_task(self.catchup_loop())
+        loop.create_task(self.sync_loop())
+        
+    def spawn(self, index, port):
+        shard_ids = list(range(index, self.shard_count, self.workers))
+        process = multiprocessing.get_context("spawn").Process(
+            target=worker_main,
+            args=(index, shard_ids, self.shard_count, port, self.token, self.profile_name),
+            name=f"shard-worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        return process
+        
+    async def supervise(self, index, port):
+        """Keep a worker process running until the coordinator drains"""
+        loop = asyncio.get_running_loop()
+        while not self.draining:
+            process = self.spawn(index, port)
+            await loop.run_in_executor(None, process.join)
+            if self.draining:
+                break
+            log.error("Shard worker exited, restarting", extra={"fields": {
+                "worker": index,
+                "exit_code": process.exitcode,
+            }})
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+        
+    async def sync_loop(self):
+        """Push settings changed outside a command, e.g. by the config file"""
+        while not self.is_closed():
+            await asyncio.sleep(CLOCK_INTERVAL)
+            self.broadcast_state()
+        
+    async def handle_worker(self, reader, writer):
+        try:
+            hello = json.loads(await reader.readline() or "{}")
+        except ValueError:
+            hello = {}
+        if hello.get("op") != "hello" or not secrets.compare_digest(str(hello.get("token")), self.token):
+            log.warning("Rejected IPC connection")
+            writer.close()
+            return
+        
+        index = hello["worker"]
+        self.connections[index] = writer
+        send_ipc(writer, replica_message())
+        log.info("Shard worker connected", extra={"fields": {"worker": index}})
+        
+        async for message in read_ipc(reader):
+            op = message["op"]
+            if op == "log":
+                log_command(message["user"], message["content"])
+            elif op == "command":
+                task = asyncio.get_running_loop().create_task(self.handle_command(writer, message))
+                self.in_flight.add(task)
+                task.add_done_callback(self.in_flight.discard)
+            elif op == "patch":
+                for key, value in message["changes"].items():
+                    if key == "permissions":
+                        state.setdefault("permissions", {}).update(value)
+                    elif key in WORKER_KEYS:
+                        state[key] = value
+                save_state()
+                self.broadcast_state()
+            elif op == "guilds":
+                self.user = RemoteUser(**message["user"])
+                self.worker_guilds[index] = message["guilds"]
+                # Catch-up waits (bounded) for all shards, so a notice reaches its channel
+                if len(self.worker_guilds) == self.workers:
+                    self.ready.set()
+        
+        log.warning("Shard worker disconnected", extra={"fields": {"worker": index}})
+        if self.connections.get(index) is writer:
+            del self.connections[index]
+            self.worker_guilds.pop(index, None)
+        writer.close()
+        
+    async def handle_command(self, writer, message):
+        """Run a forwarded command; the worker already authorized it"""
+        entry = COMMANDS[message["name"]]
+        author = RemoteUser(**message["author"])
+        channel = discord.Object(id=message["channel_id"]) if message["channel_id"] else None
+        try:
+            response = await entry["handler"](self, author, channel, message["args"])
+        except Exception:
+            command_log.exception("Forwarded command failed", extra={"fields": {"command": message["name"]}})
+            response = COMMAND_FAILED
+        
+        if not writer.is_closing():
+            send_ipc(writer, {"op": "reply", "id": message["id"], "reply": encode_reply(response)})
+        # Calendar changes reach every worker's replica
+        self.broadcast_state()
+        
+    # Shutdown
+    
+    def request_drain(self, reason):
+        if self.drain_task is None:
+            self.drain_task = asyncio.get_running_loop().create_task(self.drain(reason))
+        
+    async def drain(self, reason):
+        """Drain the workers first; they may still need replies from here"""
+        self.draining = True
+        log.info("Draining shard workers", extra={"fields": {"reason": reason, "workers": len(self.processes)}})
+        self.broadcast({"op": "drain"})
+        
+        # Workers drain their own commands and sends within DRAIN_TIMEOUT
+        await asyncio.wait(self.supervisors, timeout=DRAIN_TIMEOUT * 2)
+        for process in self.processes.values():
+            if process.is_alive():
+                log.warning("Shard worker did not stop in time", extra={"fields": {"worker": process.name}})
+                process.terminate()
+        
+        if self.in_flight:
+            await asyncio.wait(self.in_flight, timeout=DRAIN_TIMEOUT)
+        self.server.close()
+        for writer in list(self.connections.values()):
+            writer.close()
+        await asyncio.sleep(0)  # Let the connection handlers finish
+        self.closed.set()
+
+async def recommended_shard_count():
+    """Ask Discord how many shards the bot should use"""
+    client = discord.Client(intents=intents)
+    try:
+        await client.login(TOKEN)
+        data = await client.http.get_bot_gateway()
+        return data[0]
+    finally:
+        await client.close()
+
+async def run_coordinator(coordinator, deadline=None):
+    """Run the coordinator, draining ahead of the host deadline if there is one"""
+    await coordinator.start()
+    
+    stop_in = None
+    if deadline:
+        elapsed = time.monotonic() - PROCESS_START
+        stop_in = max(0, deadline - DRAIN_MARGIN - elapsed)
+    
+    try:
+        await asyncio.wait_for(asyncio.shield(coordinator.closed.wait()), timeout=stop_in)
+    except asyncio.TimeoutError:
+        coordinator.request_drain("deadline")
+    await coordinator.closed.wait()
+
+# ==================== MAIN EXECUTION ====================
+
+async def run_bot(bot, deadline=None):
+    """Run the bot, draining ahead of the host deadline if there is one"""
+    async with bot:
+        runner = asyncio.create_task(bot.start(TOKEN))
+        
+        stop_in = None
+        if deadline:
+            elapsed = time.monotonic() - PROCESS_START
+            stop_in = max(0, deadline - DRAIN_MARGIN - elapsed)
+        
+        done, _ = await asyncio.wait({runner}, timeout=stop_in)
+        if runner not in done:
+            bot.request_drain("deadline")
+        await runner
+
+def shard_count_arg(value):
+    """Parse --shards: a positive number, or "auto" for Discord's recommendation"""
+    if value == "auto":
+        return value
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Government date bot")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=os.getenv("HOST_PROFILE", DEFAULT_PROFILE),
+        help="Host profile (default: $HOST_PROFILE or %(default)s)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=int,
+        default=int(os.environ["RUN_DEADLINE"]) if os.getenv("RUN_DEADLINE") else None,
+        help="Seconds after start when the host kills the process; 0 disables "
+             "(default: $RUN_DEADLINE or the profile's deadline)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=shard_count_arg,
+        default=shard_count_arg(SHARD_COUNT) if SHARD_COUNT else None,
+        help='Gateway shards, or "auto" (default: $SHARD_COUNT, else 1 or one per worker)',
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SHARD_WORKERS,
+        help="Run the shards in this many worker processes behind a state "
+             "coordinator; 0 runs everything in this process (default: $SHARD_WORKERS or 0)",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 0:
+        parser.error("--workers must be 0 or more")
+    if args.workers > 0 and isinstance(args.shards, int) and args.shards < args.workers:
+        parser.error(f"--shards {args.shards} is fewer than --workers {args.workers}; every worker needs a shard")
+    
+    start_runtime(args.profile, args.deadline)
+    try:
+        # Clean shutdown handler
         atexit.register(shutdown)
         
-        print("Starting bot...")
-        bot.run(TOKEN)
+        if args.workers > 0:
+            # None lets the coordinator ask Discord for the recommended count
+            shard_count = {None: args.workers, "auto": None}.get(args.shards, args.shards)
+            log.info("Starting shard coordinator")
+            coordinator = Coordinator(shard_count, args.workers, args.profile)
+            asyncio.run(run_coordinator(coordinator, profile["deadline"]))
+        else:
+            bot = GovernmentBot(shard_count={None: 1, "auto": None}.get(args.shards, args.shards))
+            log.info("Starting bot")
+            asyncio.run(run_bot(bot, profile["deadline"]))
         
     except discord.LoginFailure:
-        print("ERROR: Invalid Discord token!")
+        log.error("Invalid Discord token")
     except KeyboardInterrupt:
-        print("\nBot stopped by user")
-    except Exception as e:
-        print(f"ERROR: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        log.info("Bot stopped by user")
+    except Exception:
+        log.exception("Bot crashed")
     finally:
         shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Fast-forward simulation of the date bot
+Drives the real advancement logic through months of virtual time with a
+simulated clock, including outages and restarts, checks calendar
+invariants along the way and reports throughput as a benchmark
+
+    python simulate.py --days 365 --start 2027-11-01 --seed 1
+"""
+
+import argparse
+import asyncio
+import copy
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from dateutil.relativedelta import relativedelta
+
+import bot
+
+
+class SimulatedClient:
+    """Stands in for GovernmentBot where the advancement logic needs it"""
+    def __init__(self):
+        self.sent = []
+
+    def queue_send(self, channel, content):
+        self.sent.append(content)
+
+    def request_clock_refresh(self):
+        pass
+
+
+class InvariantError(AssertionError):
+    pass
+
+
+def check(condition, message):
+    if not condition:
+        raise InvariantError(message)
+
+
+def restart():
+    """Simulate a process restart: persist, then load everything back from disk"""
+    bot.save_state()
+    bot.load_state()
+    bot.load_settings()
+
+
+async def run_check(client, totals):
+    """One scheduled check, verifying its effect on the calendar"""
+    now = bot.now_est()
+    today = now.date()
+    before = datetime.fromisoformat(bot.state["current_date"])
+    last_advance = datetime.fromisoformat(bot.state["last_advance_date"]).date()
+    expected_days = (today - last_advance).days
+    config = bot.settings()
+
+    advanced, days_missed, months, new_date = await bot.check_and_advance_date(client, "sim-channel")
+    after = datetime.fromisoformat(bot.state["current_date"])
+    stamp = now.strftime("%Y-%m-%d %H:%M %Z")
+
+    check(expected_days >= 0, f"{stamp}: last advance {last_advance} is in the future")
+    check(advanced == (expected_days > 0), f"{stamp}: advanced={advanced} with {expected_days} day(s) missed")
+    check(bot.state["last_advance_date"] == today.isoformat() or not advanced,
+          f"{stamp}: last advance not moved to today")
+
+    if advanced:
+        expected_months = min(config["months_per_day"] * expected_days, config["max_advance_per_run"])
+        check(days_missed == expected_days, f"{stamp}: reported {days_missed} days, expected {expected_days}")
+        check(months == expected_months, f"{stamp}: advanced {months} months, expected {expected_months}")
+        check(after.date() == (before + relativedelta(months=months)).date(),
+              f"{stamp}: {before:%B %Y} + {months} months gave {after:%B %Y}")
+        check(after > before, f"{stamp}: calendar went backwards")
+        totals["advancements"] += 1
+        totals["months"] += months
+        totals["catch_ups"] += days_missed > 1
+    else:
+        check(after == before, f"{stamp}: calendar changed without an advancement")
+    totals["checks"] += 1
+
+
+async def check_batch_and_replay(client, user):
+    """Apply a batch and a manual advance, replay them, then restore the state"""
+    saved = copy.deepcopy(bot.state)
+    try:
+        before = bot.state["current_date"]
+        operations, error = bot.parse_batch("setdate January 2030; advance 4; advance 4".split())
+        check(error is None, f"batch did not parse: {error}")
+        _, error = bot.apply_batch(operations, dry_run=True)
+        check(error is None and bot.state["current_date"] == before, "dry run changed the calendar")
+        _, error = bot.apply_batch(operations)
+        check(error is None, f"batch failed: {error}")
+        current = datetime.fromisoformat(bot.state["current_date"])
+        check(f"{current:%B %Y}" == "September 2030", f"batch ended at {current:%B %Y}")
+        
+        stats = copy.deepcopy(bot.state["stats"])
+        await bot.dispatch_command(client, "advance", user, None, ["2"])
+        check(bot.state["advancement_history"][-1]["type"] == "manual", "manual advance not typed manual")
+        by_type = bot.state["stats"]["advancements_by_type"]
+        check(by_type.get("manual", 0) == stats["advancements_by_type"].get("manual", 0) + 1
+              and bot.state["stats"]["days_missed_count"] == stats["days_missed_count"],
+              "manual advance counted as scheduled")
+        
+        advances = bot.state["advancement_history"][-3:]
+        replayed, problems = bot.replay_advancements(advances)
+        check(f"{replayed:%B %Y}" == "November 2030" and not problems,
+              f"replay gave {replayed:%B %Y} with {problems}")
+        replayed, problems = bot.replay_advancements(advances, bot.parse_month_year("March", "2040"))
+        check(f"{replayed:%B %Y}" == "January 2041" and not problems,
+              f"replay from March 2040 gave {replayed:%B %Y} with {problems}")
+        replayed, problems = bot.replay_advancements(bot.state["advancement_history"][-4:],
+                                                     bot.parse_month_year("March", "2040"))
+        check(f"{replayed:%B %Y}" == "November 2030", f"replay ignored the setdate: {replayed:%B %Y}")
+    finally:
+        bot.state.clear()
+        bot.state.update(saved)
+        bot.save_state()
+
+async def simulate(args):
+    rng = random.Random(args.seed)
+    start = datetime.fromisoformat(args.start).replace(tzinfo=bot.EST)
+    clock = bot.SimulatedClock(start)
+    bot.set_clock(clock)
+
+    # Fresh state file seeded at the start date
+    bot.DATA_FILE = os.path.join(args.workdir, "sim_state.json")
+    if os.path.exists(bot.DATA_FILE):
+        os.remove(bot.DATA_FILE)
+    bot.load_state()
+    bot.state["current_date"] = start.isoformat()
+    bot.state["last_advance_date"] = start.date().isoformat()
+    bot.load_settings()
+    # Saves happen explicitly on restart, like the shutdown path
+    bot.update_settings({"auto_save": False}, "simulation", persist=False)
+    start_date = datetime.fromisoformat(bot.state["current_date"])
+
+    client = SimulatedClient()
+    user = SimpleNamespace(id=1, mention="@sim")
+    totals = {"checks": 0, "advancements": 0, "months": 0, "catch_ups": 0,
+              "restarts": 0, "outages": 0, "outage_days": 0, "commands": 0}
+    step = timedelta(minutes=args.interval)
+    end = clock.current + timedelta(days=args.days)
+
+    wall_start = time.perf_counter()
+    while clock.current < end:
+        if rng.random() < args.outage_rate * step / timedelta(days=1):
+            # Host down for a while, then comes back with a fresh process
+            outage = timedelta(hours=rng.uniform(6, 24 * args.max_outage_days))
+            clock.advance(outage)
+            totals["outages"] += 1
+            totals["outage_days"] += outage / timedelta(days=1)
+            restart()
+            totals["restarts"] += 1
+        elif rng.random() < args.restart_rate * step / timedelta(days=1):
+            restart()
+            totals["restarts"] += 1
+
+        await run_check(client, totals)
+
+        for _ in range(args.commands):
+            bot.log_command(user.id, "!date")
+            await bot.dispatch_command(client, "date", user, None, [])
+            totals["commands"] += 1
+
+        clock.advance(step)
+    elapsed = time.perf_counter() - wall_start
+
+    # End-to-end: the calendar moved exactly by the months we saw advanced
+    final = datetime.fromisoformat(bot.state["current_date"])
+    check(final.date() == (start_date + relativedelta(months=totals["months"])).date(),
+          f"final date {final:%B %Y} != start + {totals['months']} months")
+    _, problems = bot.replay_advancements(bot.state["advancement_history"])
+    check(not problems, f"history replay found problems: {problems[:3]}")
+    await check_batch_and_replay(client, SimpleNamespace(id=bot.ADMIN_USER_ID, mention="@admin"))
+
+    simulated_days = args.days
+    print("=" * 60)
+    print(f"Simulated {simulated_days} days from {start:%Y-%m-%d} (seed {args.seed})")
+    print(f"Checks: {totals['checks']} every {args.interval} min")
+    print(f"Advancements: {totals['advancements']} ({totals['catch_ups']} catch-up), "
+          f"{totals['months']} months -> {final:%B %Y}")
+    print(f"Outages: {totals['outages']} ({totals['outage_days']:.1f} days), restarts: {totals['restarts']}")
+    print(f"Commands: {totals['commands']}, notifications: {len(client.sent)}")
+    print("Invariants: OK (including batch and replay)")
+    print(f"Wall time: {elapsed:.2f}s, {simulated_days / elapsed:.0f} simulated days/s")
+    print("=" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fast-forward simulation of the date bot")
+    parser.add_argument("--days", type=int, default=365, help="Virtual days to simulate")
+    parser.add_argument("--start", default="2027-11-01", help="Start date (covers DST and a leap day by default)")
+    parser.add_argument("--interval", type=int, default=25, help="Minutes between checks (Actions cadence)")
+    parser.add_argument("--outage-rate", type=float, default=0.02, help="Outages per virtual day")
+    parser.add_argument("--max-outage-days", type=float, default=5, help="Longest outage in days")
+    parser.add_argument("--restart-rate", type=float, default=0.5, help="Restarts per virtual day")
+    parser.add_argument("--commands", type=int, default=0, help="!date commands per check")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="Directory for the simulated state file")
+    parser.add_argument("--verbose", action="store_true", help="Show bot logging")
+    args = parser.parse_args(argv)
+
+    bot.setup_logging("text", "")
+    if not args.verbose:
+        # Filter on the handler; the bot still manages its logger level
+        for handler in bot.log.handlers:
+            handler.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.workdir = args.workdir or tmp
+        try:
+            asyncio.run(simulate(args))
+        except InvariantError as e:
+            print(f"INVARIANT VIOLATED: {e}")
+            return 1
+        finally:
+            bot.stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())